@@ -0,0 +1,80 @@
+"""
+Cold import time of eclyon entry points, each measured in fresh interpreters,
+and the heavy dependencies they pull in.
+
+    python benchmarks/bench_import.py [--repeat 5] [--budget-ms 50]
+
+Exits with 1 if `import eclyon` takes more than --budget-ms (median), or if
+the numpy-only inference path imports sklearn, pandas or joblib.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+import numpy as np
+
+
+REPO = Path(__file__).resolve().parent.parent
+HEAVY = ['numpy', 'pandas', 'joblib', 'sklearn', 'matplotlib', 'IPython', 'graphviz', 'streamlit']
+STATEMENTS = {
+    'import eclyon': 'import eclyon',
+    'eclyon.inference': 'import eclyon.inference',
+    'eclyon.inference + load': "from eclyon.inference import load_model; load_model({model!r})",
+    'eclyon.forest': 'import eclyon.forest',
+    'eclyon.predict': 'import eclyon.predict',
+    'eclyon.plot': 'import eclyon.plot',
+    'eclyon.transforms': 'import eclyon.transforms',
+    'eclyon.categories': 'import eclyon.categories',
+    'eclyon.server': 'import eclyon.server',
+}
+PROBE = '''
+import sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'ms': elapsed * 1e3, 'modules': [m for m in {heavy!r} if m in sys.modules]}}))
+'''
+
+
+def measure(statement: str, repeat: int) -> dict:
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, '-c', 'import json\n' + PROBE.format(statement = statement, heavy = HEAVY)],
+            capture_output = True, text = True, check = True, cwd = REPO,
+        )
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {'ms': float(np.median([r['ms'] for r in runs])), 'modules': runs[-1]['modules']}
+
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type = int, default = 5)
+    parser.add_argument('--budget-ms', type = float, default = 50.0)
+    parser.add_argument('--model', type = Path, default = REPO / 'final_model.pkl')
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        from eclyon.inference import export_model
+        export_model(args.model, Path(tmp) / 'model')
+        for name, statement in STATEMENTS.items():
+            results[name] = r = measure(statement.format(model = str(Path(tmp) / 'model')), args.repeat)
+            print(f'{name:28s} {r["ms"]:9.1f} ms   loads: {", ".join(r["modules"]) or "-"}')
+
+    failed = False
+    if results['import eclyon']['ms'] > args.budget_ms:
+        print(f'import eclyon over budget: {results["import eclyon"]["ms"]:.1f} ms > {args.budget_ms} ms')
+        failed = True
+    heavy = set(results['eclyon.inference + load']['modules']) - {'numpy'}
+    if heavy:
+        print(f'numpy-only inference path imports {", ".join(sorted(heavy))}')
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Compare the per-row scoring path of the demo app with batch scoring through
+eclyon.predict.Predictor, on rows drawn from DS.csv.
+
+    python benchmarks/bench_predict.py [--model final_model.pkl] [--rows 10000]
+"""
+import argparse
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from eclyon.predict import Predictor
+
+
+REPO = Path(__file__).resolve().parent.parent
+
+
+def load_features(predictor: Predictor, n_rows: int) -> np.ndarray:
+    ds = pd.read_csv(REPO / 'DS.csv')
+    for n in ds.select_dtypes(exclude = [np.number]).columns:
+        ds[n] = pd.Categorical(ds[n]).codes
+    X = predictor.as_array(ds)
+    return X[np.arange(n_rows) % len(X)]
+
+
+def timeit(fn, X: np.ndarray, repeat: int) -> float:
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(X)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__)
+    parser.add_argument('--model', default = REPO / 'final_model.pkl')
+    parser.add_argument('--rows', type = int, default = 10_000)
+    parser.add_argument('--per-row-rows', type = int, default = 200)
+    parser.add_argument('--repeat', type = int, default = 5)
+    args = parser.parse_args()
+
+    predictor = Predictor.load(args.model)
+    X = load_features(predictor, args.rows)
+    X_small = X[:args.per_row_rows]
+
+    assert np.allclose(predictor.predict(X_small), predictor.predict_rows(X_small))
+    per_row = timeit(predictor.predict_rows, X_small, 1) / len(X_small)
+    batch = timeit(predictor.predict, X, args.repeat) / len(X)
+    estimator = timeit(
+        lambda A: predictor.model.predict(pd.DataFrame(A, columns = predictor.feature_names)), X, args.repeat,
+    ) / len(X)
+
+    print(f'model: {type(predictor.model).__name__} ({"linear" if predictor.is_linear else "estimator"} path)')
+    print(f'per-row predict   : {per_row * 1e6:10.2f} us/row')
+    print(f'estimator batch   : {estimator * 1e6:10.2f} us/row')
+    print(f'Predictor.predict : {batch * 1e6:10.2f} us/row  ({per_row / batch:.0f}x vs per-row)')
+
+
+if __name__ == '__main__':
+    main()
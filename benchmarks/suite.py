@@ -0,0 +1,169 @@
+"""
+Latency, memory and allocation benchmarks of every stage of the predict
+path, on DS.csv and on synthetic copies of it scaled up by resampling rows.
+
+    python benchmarks/suite.py --scales 1,10,100 --save baseline.json
+    python benchmarks/suite.py --scales 1,10,100 --compare baseline.json
+
+Each stage reports the p50 and max wall time over --repeat calls (divided
+by the scale, with at least 3), the p99 only when there are at least
+P99_MIN_SAMPLES calls (with fewer it is just the max), the process peak RSS
+once it has run, and the peak and net memory it allocated (measured in a
+separate traced call). With --compare, stages whose p50 got slower than
+--tolerance times the baseline are flagged and the exit code is 1. Scale
+1000 (about 5M rows) is supported but needs several GB of memory.
+"""
+import argparse
+import json
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+import joblib
+import numpy as np
+import pandas as pd
+
+from eclyon import explain, transforms
+from eclyon.categories import CategoryEncoder, encoder_path
+from eclyon.forest import FlatForest
+from eclyon.predict import Predictor
+
+
+REPO = Path(__file__).resolve().parent.parent
+BATCH_SIZES = [1, 100, 10_000]
+P99_MIN_SAMPLES = 100
+
+
+def synthetic(ds: pd.DataFrame, scale: int, seed: int = 0) -> pd.DataFrame:
+    """
+    DS.csv resampled to scale times its size, numeric columns jittered by 1%
+    of their std so that rows are not exact duplicates, plus a session date
+    column of timestamp strings to exercise add_date_columns.
+    """
+    rng = np.random.default_rng(seed)
+    df = ds.iloc[rng.integers(0, len(ds), len(ds) * scale)].reset_index(drop = True)
+    for n in df.select_dtypes(include = [np.number]).columns:
+        df[n] = df[n] + rng.normal(0, 0.01 * ds[n].std(), len(df))
+    dates = pd.Timestamp('2024-03-01') + pd.to_timedelta(rng.integers(0, 180 * 24, len(df)), unit = 'h')
+    df['Session_Date'] = dates.strftime('%Y-%m-%d %H:%M:%S')
+    return df
+
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2**20 if sys.platform == 'darwin' else rss / 2**10
+
+
+def measure(fn, repeat: int) -> dict:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    fn()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    times = np.array(times) * 1e3
+    return {
+        'p50_ms': float(np.percentile(times, 50)),
+        'p99_ms': float(np.percentile(times, 99)) if len(times) >= P99_MIN_SAMPLES else None,
+        'max_ms': float(times.max()),
+        'n_repeat': len(times),
+        'peak_rss_mb': peak_rss_mb(),
+        'alloc_peak_mb': (peak - before) / 2**20,
+        'alloc_net_mb': (current - before) / 2**20,
+    }
+
+
+def stages(df: pd.DataFrame, csv_path: Path, scale: int) -> dict:
+    """
+    The benchmarked callables, by stage name, for one scaled dataset.
+    """
+    encoder = CategoryEncoder.load(encoder_path(REPO / 'final_model.pkl'))
+    X = encoder.transform(df.drop(columns = ['Lap_Time_s', 'Session_Date']))
+    final_model = Predictor.load(REPO / 'final_model.pkl')
+    rf_model = Predictor.load(REPO / 'rf_model.pkl')
+    rf_flat = FlatForest.from_sklearn(rf_model.model)
+    X_arr = final_model.as_array(X)
+
+    res = {
+        'csv_load': lambda: pd.read_csv(csv_path),
+        'process_df': lambda: transforms.process_df(df.drop(columns = 'Session_Date'), 'Lap_Time_s'),
+        'add_date_columns': lambda: transforms.add_date_columns(df[['Session_Date']], ['Session_Date']),
+        'label_encoding': lambda: encoder.transform(df),
+    }
+    for b in BATCH_SIZES:
+        if b > len(X):
+            continue
+        rows = X.iloc[:b]
+        res[f'final_model.predict[{b}]'] = lambda rows = rows: final_model.model.predict(rows)
+        res[f'Predictor(final_model)[{b}]'] = lambda b = b: final_model.predict(X_arr[:b])
+        res[f'rf_model.predict[{b}]'] = lambda rows = rows: rf_model.model.predict(rows)
+        res[f'FlatForest(rf_model)[{b}]'] = lambda b = b: rf_flat.predict(X_arr[:b])
+    res['final_model.predict[all]'] = lambda: final_model.model.predict(X)
+    res['rf_model.predict[all]'] = lambda: rf_model.model.predict(X)
+    if scale == 1:
+        res['explain.rf_feat_importance'] = lambda: explain.rf_feat_importance(rf_model.model, X)
+        res['explain.rf_unfolded_feat_importance'] = lambda: explain.rf_unfolded_feat_importance(rf_model.model, X)
+        res['explain.forest_feature_importance'] = lambda: explain.forest_feature_importance(rf_model.model)
+    return res
+
+
+def run(scales: list[int], repeat: int) -> dict:
+    ds = pd.read_csv(REPO / 'DS.csv')
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in scales:
+            df = synthetic(ds, scale)
+            csv_path = Path(tmp) / f'ds_x{scale}.csv'
+            df.to_csv(csv_path, index = False)
+            n_repeat = max(3, repeat // scale)
+            for name, fn in stages(df, csv_path, scale).items():
+                key = f'x{scale}/{name}'
+                results[key] = {'rows': len(df), **measure(fn, n_repeat)}
+                r = results[key]
+                tail = f'p99 {r["p99_ms"]:10.3f}' if r['p99_ms'] is not None else f'max {r["max_ms"]:10.3f}'
+                print(f'{key:50s} n {n_repeat:4d}  p50 {r["p50_ms"]:10.3f} ms  {tail} ms  '
+                      f'alloc {r["alloc_peak_mb"]:9.2f} MB  rss {r["peak_rss_mb"]:8.1f} MB', flush = True)
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for key, r in results.items():
+        if key in baseline:
+            ratio = r['p50_ms'] / max(baseline[key]['p50_ms'], 1e-9)
+            flag = 'REGRESSION' if ratio > tolerance else ''
+            print(f'{key:50s} {ratio:6.2f}x baseline p50 {flag}')
+            if flag:
+                regressions.append(key)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', default = '1,10,100')
+    parser.add_argument('--repeat', type = int, default = 100)
+    parser.add_argument('--save', type = Path)
+    parser.add_argument('--compare', type = Path)
+    parser.add_argument('--tolerance', type = float, default = 1.25)
+    args = parser.parse_args()
+
+    results = run([int(s) for s in args.scales.split(',')], args.repeat)
+    if args.save:
+        meta = {'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+                'joblib': joblib.__version__, 'machine': platform.machine()}
+        args.save.write_text(json.dumps({'meta': meta, 'results': results}, indent = 2))
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())['results']
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
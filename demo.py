@@ -1,10 +1,36 @@
+import os
 import streamlit as st
-import joblib
-import pandas as pd
 
-from sklearn.preprocessing import LabelEncoder
 from pathlib import Path
 
+from eclyon.cache import PredictionCache
+from eclyon.categories import CategoryEncoder, encoder_path
+from eclyon.predict import Predictor
+from eclyon.presets import BASE_SETUP, CAR_PRESETS, TRACK_PRESETS
+from eclyon.server import RemoteModel
+
+
+# The loaders take the modification time of the file as well, so that a
+# retrained model written over the old one is loaded again on the next rerun
+
+
+@st.cache_resource
+def load_model(model_path: Path, mtime: int) -> PredictionCache | RemoteModel:
+    # Score through a running eclyon.server instead when LAPTIME_SERVER_URL is set
+    if os.environ.get('LAPTIME_SERVER_URL'):
+        return RemoteModel(os.environ['LAPTIME_SERVER_URL'])
+    return PredictionCache.for_model(model_path, path = model_path.with_suffix('.cache.sqlite'))
+
+
+@st.cache_resource
+def load_encoder(model_path: Path, mtime: int) -> CategoryEncoder:
+    return CategoryEncoder.load(encoder_path(model_path))
+
+
+@st.cache_resource
+def load_forest(model_path: Path, mtime: int) -> Predictor:
+    # Spread of the random forest's trees, shown next to the prediction as its uncertainty
+    return Predictor.load(model_path)
 
 
 def app():
@@ -12,10 +38,14 @@ def app():
     st.write("<h2 style= 'text-align: center; color: orange'>This app predicts the fastest lap time of a driver and his car based on the data you provide.</h1>", unsafe_allow_html=True)
 
     model_path = Path(__file__).parent / 'final_model.pkl'
-    final_model = joblib.load(model_path)
+    forest_path = Path(__file__).parent / 'rf_model.pkl'
+    final_model = load_model(model_path, model_path.stat().st_mtime_ns)
+    encoder = load_encoder(model_path, encoder_path(model_path).stat().st_mtime_ns)
+    forest = load_forest(forest_path, forest_path.stat().st_mtime_ns)
 
     if 'predictions' not in st.session_state:
         st.session_state.predictions = []
+        st.session_state.intervals = []
     if 'page' not in st.session_state:
         st.session_state.page = 'home'
 
@@ -41,19 +71,21 @@ def app():
             RearTireDiameter = st.number_input("Rear Tire Diameter (cm)", value=18)
             DragCoefficient = st.number_input("Drag Coefficient", value=0.3)
             FrontalArea = st.number_input("Frontal Area (m^2)", value=2)
+            TransmissionType = st.selectbox("Transmission Type", options=encoder.categories["Transmission_Type"], format_func=str.capitalize)
+            DifferentialType = st.selectbox("Differential Type", options=encoder.categories["Differential_Type"], format_func=str.capitalize)
 
         with st.expander("Tire and Suspension Setup"):
             FrontTirePressure = st.number_input("Front Tire Pressure (bar)", value=1.5)
             RearTirePressure = st.number_input("Rear Tire Pressure (bar)", value=1.5)
-            FrontSuspension = st.number_input("Front Suspension (mm)", value=150)
-            RearSuspension = st.number_input("Rear Suspension (mm)", value=150)
+            FrontSuspension = st.selectbox("Front Suspension", options=encoder.categories["Front_Suspension"], format_func=str.capitalize)
+            RearSuspension = st.selectbox("Rear Suspension", options=encoder.categories["Rear_Suspension"], format_func=str.capitalize)
             FrontTireDegradation = st.number_input("Front Tire Degradation (%)", value=0)
             RearTireDegradation = st.number_input("Rear Tire Degradation (%)", value=0)
             TireChangeCount = st.number_input("Tire Change Count", value=0)
 
         with st.expander("Driver Characteristics"):
             DriverReflexes = st.number_input("Driver Reflexes (ms)", value=120)
-            DriverExperience = st.selectbox("Driver Experience", options=["Beginner", "Intermediate", "Advanced", "Professional"])
+            DriverExperience = st.selectbox("Driver Experience", options=encoder.categories["Driver_Experience"], format_func=str.capitalize)
             DriverFatigue = st.slider("Driver Fatigue (%)", 0, 100, 50, format="%d%%")
             DriverWeight = st.number_input("Driver Weight (kg)", value=70)
         
@@ -63,10 +95,10 @@ def app():
             Humidity = st.slider("Humidity (%)", 0, 100, 50, format="%d%%")
             WindSpeed = st.number_input("Wind Speed (km/h)", value=0)
             WindDirection = st.number_input("Wind Direction (°)", value=0)
-            TrackCondition = st.selectbox("Track Condition", options=["Dry", "Wet", "Damp"])
+            TrackCondition = st.selectbox("Track Condition", options=encoder.categories["Track_Condition"], format_func=str.capitalize)
             TrackAltitude = st.number_input("Track Altitude (m)", value=0)
             TrackLength = st.number_input("Track Length (km)", value=5)
-            SurfaceType = st.selectbox("Surface Type", options=["Asphalt", "Gravel", "Concrete"])
+            SurfaceType = st.selectbox("Surface Type", options=encoder.categories["Surface_Type"], format_func=str.capitalize)
             MaxGradient = st.number_input("Max Gradient (%)", value=0)
             NumberCorner = st.number_input("Number of Corners", value=10)
             NumberStraight = st.number_input("Number of Straights", value=2)
@@ -74,21 +106,23 @@ def app():
         with st.expander("Brake and Fuel System"):
             FrontBrakeTemperature = st.number_input("Front Brake Temperature (°C)", value=300)
             RearBrakeTemperature = st.number_input("Rear Brake Temperature (°C)", value=300)
-            FuelType = st.selectbox("Fuel Type", options=["Petrol", "Diesel", "Electric"])
+            FrontBrakes = st.selectbox("Front Brakes", options=encoder.categories["Front_Brakes"], format_func=str.capitalize)
+            RearBrakes = st.selectbox("Rear Brakes", options=encoder.categories["Rear_Brakes"], format_func=str.capitalize)
+            FuelType = st.selectbox("Fuel Type", options=encoder.categories["Fuel_Type"], format_func=str.capitalize)
             FuelConsumption = st.number_input("Fuel Consumption (L/100km)", value=10)
 
             
         with st.expander("Race and Strategy"):
-            Strategy = st.selectbox("Strategy", options=["Aggressive", "Conservative"])
+            Strategy = st.selectbox("Strategy", options=encoder.categories["Race_Strategy"], format_func=str.capitalize)
             Overtakes = st.number_input("Overtakes", value=0)
             HarshBraking = st.number_input("Harsh Braking", value=0)
             DriverMistakes = st.number_input("Driver Mistakes", value=0)
             TrajectoryChanges = st.number_input("Trajectory Changes", value=0)
 
         with st.expander("Maintenance and Technical Health"):
-            GearboxCondition = st.selectbox("Gearbox Condition", options=["Good", "Acceptable", "Bad"])
-            EngineCondition = st.selectbox("Engine Condition", options=["Good", "Acceptable", "Bad"])
-            TechnicalProblems = st.selectbox("Technical Problems", options=["Yes", "No"])
+            GearboxCondition = st.selectbox("Gearbox Condition", options=encoder.categories["Gearbox_Condition"], format_func=str.capitalize)
+            EngineCondition = st.selectbox("Engine Condition", options=encoder.categories["Engine_Condition"], format_func=str.capitalize)
+            TechnicalProblems = st.selectbox("Technical Problems", options=encoder.categories["Technical_Problems"], format_func=str.capitalize)
             
             
         col1, col2, col3 = st.columns(3)
@@ -101,7 +135,7 @@ def app():
                     'Top_Speed_kmh': top_speed,
                     'Acceleration_0_100_kmh': acceleration,
                     'Weight_Distribution_percentage': WeightDistribution,
-                    'Transmission_Type': 0,  
+                    'Transmission_Type': TransmissionType,
                     'Gear_Count': 0,  
                     'Front_Tire_Pressure_bar': FrontTirePressure,
                     'Rear_Tire_Pressure_bar': RearTirePressure,
@@ -115,11 +149,11 @@ def app():
                     'Fuel_Consumption_L_100km': FuelConsumption,
                     'Front_Brake_Temperature_C': FrontBrakeTemperature,
                     'Rear_Brake_Temperature_C': RearBrakeTemperature,
-                    'Differential_Type': 0,  
+                    'Differential_Type': DifferentialType,
                     'Front_Camber_Angle_deg': 0,  
                     'Rear_Camber_Angle_deg': 0,  
-                    'Front_Brakes': 0,  
-                    'Rear_Brakes': 0,  
+                    'Front_Brakes': FrontBrakes,
+                    'Rear_Brakes': RearBrakes,
                     'Track_Temperature_C': TrackTemperature,
                     'Ambient_Temperature_C': AmbiantTemperature,
                     'Humidity_percentage': Humidity,
@@ -153,213 +187,19 @@ def app():
                     'Technical_Problems': TechnicalProblems,
                     'Trajectory_Changes': TrajectoryChanges
                 }
-                le = LabelEncoder()
-                
-                categorical_features = ['Driver_Experience', 'Track_Condition', 'Surface_Type', 'Fuel_Type', 'Gearbox_Condition', 'Engine_Condition', 'Technical_Problems', 'Race_Strategy']
-                for feature in categorical_features:
-                    input_data[feature] = le.fit([input_data[feature]]).transform([input_data[feature]])[0]
-                
-                input_df = pd.DataFrame([input_data])
+                input_row = encoder.encode_row(input_data)
 
                 
-                prediction = final_model.predict(input_df)
+                prediction = final_model.predict(input_row)
                 st.session_state.predictions.append(prediction)
+                st.session_state.intervals.append(forest.predict_dist(input_row))
 
 
     if st.session_state.page == 'preset':
 
-        input_data = {
-            'Car_Weight_kg': 0,
-            'Engine_Power_hp': 0,
-            'Max_Torque_Nm': 0,
-            'Top_Speed_kmh': 0,
-            'Acceleration_0_100_kmh': 0,
-            'Weight_Distribution_percentage': 0,
-            'Transmission_Type': 0,
-            'Gear_Count': 0,
-            'Front_Tire_Pressure_bar': 0,
-            'Rear_Tire_Pressure_bar': 0,
-            'Front_Tire_Diameter_cm': 0,
-            'Rear_Tire_Diameter_cm': 0,
-            'Front_Suspension': 0,
-            'Rear_Suspension': 0,
-            'Aerodynamics_Drag_Coefficient_Cd': 0,
-            'Frontal_Area_m2': 0,
-            'Fuel_Type': 0,
-            'Fuel_Consumption_L_100km': 0,
-            'Front_Brake_Temperature_C': 0,
-            'Rear_Brake_Temperature_C': 0,
-            'Differential_Type': 0,
-            'Front_Camber_Angle_deg': 0,
-            'Rear_Camber_Angle_deg': 0,
-            'Front_Brakes': 0,
-            'Rear_Brakes': 0,
-            'Track_Temperature_C': 0,
-            'Ambient_Temperature_C': 0,
-            'Humidity_percentage': 0,
-            'Wind_Speed_kmh': 0,
-            'Wind_Direction_deg': 0,
-            'Track_Condition': 0,
-            'Track_Altitude_m': 0,
-            'Track_Length_km': 0,
-            'Surface_Type': 0,
-            'Number_of_Corners': 0,
-            'Number_of_Straights': 0,
-            'Max_Gradient_percentage': 0,
-            'Number_of_Laps': 0,
-            'Driver_Reflexes_ms': 0,
-            'Driver_Experience': 0,
-            'Driver_Fatigue': 0,
-            'Driver_Weight_kg': 0,
-            'Race_Strategy': 0,
-            'Overtakes': 0,
-            'Harsh_Braking_Count': 0,
-            'Driver_Mistakes': 0,
-            'Average_Lap_Speed_kmh': 0,
-            'Total_Race_Time_min': 0,
-            'Fastest_Lap_Time_s': 0,
-            'Slowest_Lap_Time_s': 0,
-            'Front_Tire_Degradation_percentage': 0,
-            'Rear_Tire_Degradation_percentage': 0,
-            'Tire_Changes_Count': 0,
-            'Gearbox_Condition': 0,
-            'Engine_Condition': 0,
-            'Technical_Problems': 0,
-            'Trajectory_Changes': 0
-        }
-
-        car_presets = {
-            "GT4": {
-                'Car_Weight_kg': 1350,
-                'Engine_Power_hp': 450,
-                'Max_Torque_Nm': 480,
-                'Top_Speed_kmh': 250,
-                'Acceleration_0_100_kmh': 4.0,
-                'Weight_Distribution_percentage': 50,
-                'Front_Tire_Diameter_cm': 18,
-                'Rear_Tire_Diameter_cm': 18,
-                'Aerodynamics_Drag_Coefficient_Cd': 0.32,
-                'Frontal_Area_m2': 2.0,
-                'Front_Tire_Pressure_bar': 1.8,
-                'Rear_Tire_Pressure_bar': 1.8,
-                'Front_Suspension': 120,
-                'Rear_Suspension': 120,
-                'Fuel_Consumption_L_100km': 12,
-            },
-            "GT3": {
-                'Car_Weight_kg': 1250,
-                'Engine_Power_hp': 550,
-                'Max_Torque_Nm': 520,
-                'Top_Speed_kmh': 280,
-                'Acceleration_0_100_kmh': 3.5,
-                'Weight_Distribution_percentage': 55,
-                'Front_Tire_Diameter_cm': 19,
-                'Rear_Tire_Diameter_cm': 19,
-                'Aerodynamics_Drag_Coefficient_Cd': 0.30,
-                'Frontal_Area_m2': 1.9,
-                'Front_Tire_Pressure_bar': 1.9,
-                'Rear_Tire_Pressure_bar': 1.9,
-                'Front_Suspension': 130,
-                'Rear_Suspension': 130,
-                'Fuel_Consumption_L_100km': 10,
-            },
-            "GT2": {
-                'Car_Weight_kg': 1200,
-                'Engine_Power_hp': 650,
-                'Max_Torque_Nm': 600,
-                'Top_Speed_kmh': 300,
-                'Acceleration_0_100_kmh': 3.2,
-                'Weight_Distribution_percentage': 56,
-                'Front_Tire_Diameter_cm': 20,
-                'Rear_Tire_Diameter_cm': 20,
-                'Aerodynamics_Drag_Coefficient_Cd': 0.28,
-                'Frontal_Area_m2': 1.8,
-                'Front_Tire_Pressure_bar': 2.0,
-                'Rear_Tire_Pressure_bar': 2.0,
-                'Front_Suspension': 140,
-                'Rear_Suspension': 140,
-                'Fuel_Consumption_L_100km': 9,
-            },
-            "Hypercar": {
-                'Car_Weight_kg': 1000,
-                'Engine_Power_hp': 1000,
-                'Max_Torque_Nm': 1000,
-                'Top_Speed_kmh': 350,
-                'Acceleration_0_100_kmh': 2.5,
-                'Weight_Distribution_percentage': 58,
-                'Front_Tire_Diameter_cm': 21,
-                'Rear_Tire_Diameter_cm': 21,
-                'Aerodynamics_Drag_Coefficient_Cd': 0.25,
-                'Frontal_Area_m2': 1.7,
-                'Front_Tire_Pressure_bar': 2.2,
-                'Rear_Tire_Pressure_bar': 2.2,
-                'Front_Suspension': 150,
-                'Rear_Suspension': 150,
-                'Fuel_Consumption_L_100km': 5,
-            }
-        }
-
-
-        # Presets pour les pistes
-        track_presets = {
-            "Monza": {
-                'Track_Temperature_C': 30,
-                'Ambient_Temperature_C': 25,
-                'Humidity_percentage': 40,
-                'Wind_Speed_kmh': 5,
-                'Wind_Direction_deg': 180,
-                'Track_Condition': 0,
-                'Track_Altitude_m': 160,
-                'Track_Length_km': 5.8,
-                'Surface_Type': 0,
-                'Max_Gradient_percentage': 3,
-                'Number_of_Corners': 11,
-                'Number_of_Straights': 4,
-            },
-            "LeMans": {
-                'Track_Temperature_C': 25,
-                'Ambient_Temperature_C': 20,
-                'Humidity_percentage': 60,
-                'Wind_Speed_kmh': 10,
-                'Wind_Direction_deg': 90,
-                'Track_Condition': 0,
-                'Track_Altitude_m': 50,
-                'Track_Length_km': 13.6,
-                'Surface_Type': 0,
-                'Max_Gradient_percentage': 2,
-                'Number_of_Corners': 33,
-                'Number_of_Straights': 3,
-            },
-            "Nurburgring": {
-                'Track_Temperature_C': 18,
-                'Ambient_Temperature_C': 15,
-                'Humidity_percentage': 75,
-                'Wind_Speed_kmh': 15,
-                'Wind_Direction_deg': 270,
-                'Track_Condition': 0,
-                'Track_Altitude_m': 620,
-                'Track_Length_km': 20.8,
-                'Surface_Type': 0,
-                'Max_Gradient_percentage': 10,
-                'Number_of_Corners': 154,
-                'Number_of_Straights': 5,
-            },
-            "Spa-Francorchamps": {
-                'Track_Temperature_C': 22,
-                'Ambient_Temperature_C': 20,
-                'Humidity_percentage': 50,
-                'Wind_Speed_kmh': 8,
-                'Wind_Direction_deg': 0,
-                'Track_Condition': 0,
-                'Track_Altitude_m': 470,
-                'Track_Length_km': 7.0,
-                'Surface_Type': 0,
-                'Max_Gradient_percentage': 6,
-                'Number_of_Corners': 20,
-                'Number_of_Straights': 3,
-            }
-        }
-
+        input_data = dict(BASE_SETUP)
+        car_presets = CAR_PRESETS
+        track_presets = TRACK_PRESETS
 
         col1, col2 = st.columns(2)
         car_name = None
@@ -375,26 +215,19 @@ def app():
         
         input_data.update(selected_car)
         input_data.update(selected_track)
+        input_row = encoder.encode_row(input_data)
         
-        input_df = pd.DataFrame([input_data])
-        prediction = final_model.predict(input_df)
+        prediction = final_model.predict(input_row)
         st.session_state.predictions.append(prediction)
+        st.session_state.intervals.append(forest.predict_dist(input_row))
 
             
         col1, col2, col3 = st.columns(3)
         with col2:
             if st.button('Predict Fastest Lap Time'):
-                le = LabelEncoder()
-                
-                categorical_features = ['Driver_Experience', 'Track_Condition', 'Surface_Type', 'Fuel_Type', 'Gearbox_Condition', 'Engine_Condition', 'Technical_Problems', 'Race_Strategy']
-                for feature in categorical_features:
-                    input_data[feature] = le.fit([input_data[feature]]).transform([input_data[feature]])[0]
-                
-                input_df = pd.DataFrame([input_data])
-
-                
-                prediction = final_model.predict(input_df)
+                prediction = final_model.predict(input_row)
                 st.session_state.predictions.append(prediction)
+                st.session_state.intervals.append(forest.predict_dist(input_row))
 
     
 
@@ -413,11 +246,14 @@ def app():
             "Difference (seconds)": [0] + [
             st.session_state.predictions[i] - st.session_state.predictions[i - 1]
             for i in range(1, len(st.session_state.predictions))
-            ]
+            ],
+            "Forest 90% Interval (seconds)": [
+                f"{d['q5'][0]:.2f} - {d['q95'][0]:.2f}" for d in st.session_state.intervals
+            ],
+            "Forest Std (seconds)": [f"{d['var'][0] ** 0.5:.2f}" for d in st.session_state.intervals],
         }
-        prediction_df = pd.DataFrame(prediction_data)
         st.subheader('Prediction History')
-        st.table(prediction_df)
+        st.table(prediction_data)
 
 
     
@@ -0,0 +1,24 @@
+"""
+Submodules are imported on first attribute access (PEP 562), so that
+`import eclyon` stays cheap and only the dependencies of the modules
+actually used get loaded: `eclyon.inference` only needs numpy, while
+`eclyon.plot` or `eclyon.model_zoo` bring in matplotlib or sklearn.
+"""
+import importlib
+
+
+_SUBMODULES = {
+    'attribution', 'cache', 'categories', 'columnar', 'dtypes', 'explain', 'forest',
+    'incremental', 'inference', 'instrument', 'model_zoo', 'neighbors', 'pdp', 'permutation', 'plot',
+    'predict', 'presets', 'server', 'stream', 'sweep', 'transforms', 'tuning',
+}
+
+
+def __getattr__(name: str):
+    if name in _SUBMODULES:
+        return importlib.import_module(f'{__name__}.{name}')
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | _SUBMODULES)
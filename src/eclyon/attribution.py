@@ -0,0 +1,210 @@
+"""
+Per-prediction feature attributions (SHAP values).
+
+    explainer = explainer_for(Predictor.load('rf_model.pkl'))
+    phi = explainer.shap_values(X)     # (n_rows, n_features)
+    explainer.expected_value + phi.sum(axis = 1)   # == predictions
+
+Forests are explained with path-dependent TreeSHAP computed from the leaf
+paths of the flattened trees. Along the path to a leaf, every distinct
+feature j has a zero fraction z_j (the share of training samples following
+the path through its splits) and a one fraction o_j(x) (1 if the row
+satisfies all of its splits). The Shapley value of feature i for the leaf is
+
+    v * (o_i - z_i) * sum_k w(k, d) * [t^k] prod_{j != i} (z_j + o_j t)
+
+d being the number of distinct features on the path. The polynomial is
+built once per leaf and divided by each factor, all leaves of a block of
+trees and all rows at once, blocks of trees running in a thread pool.
+Linear models have the exact attribution coef * (x - mean(background)).
+"""
+from concurrent.futures import ThreadPoolExecutor
+from math import factorial
+import numpy as np
+import pandas as pd
+
+from eclyon.forest import FlatForest
+from eclyon.predict import Predictor
+
+
+def _shapley_weights(depth: int) -> np.ndarray:
+    """
+    w[d, k] = k! (d - k - 1)! / d!, the weight of a coalition of k of the
+    other d - 1 features.
+    """
+    w = np.zeros((depth + 1, depth))
+    for d in range(1, depth + 1):
+        for k in range(d):
+            w[d, k] = factorial(k) * factorial(d - k - 1) / factorial(d)
+    return w
+
+
+def leaf_paths(forest: FlatForest, trees: range) -> dict:
+    """
+    Distinct features of the path of every leaf of the trees, as padded
+    (n_leaves, depth) arrays: feature, interval (lo, hi] the row must fall
+    in, zero fraction z. Padding slots have the extra feature n_features,
+    an empty interval and z = 1, so that they do not change the products.
+    """
+    feature, lo, hi, zero, value = [], [], [], [], []
+    for t in trees:
+        stack = [(int(forest.roots[t]), {})]
+        while stack:
+            node, path = stack.pop()
+            f = forest.feature[node]
+            if f < 0:
+                feature.append(list(path))
+                lo.append([path[j][0] for j in path])
+                hi.append([path[j][1] for j in path])
+                zero.append([path[j][2] for j in path])
+                value.append(forest.value[node])
+                continue
+            n = forest.n_node_samples[node]
+            f_lo, f_hi, f_z = path.get(f, (-np.inf, np.inf, 1.0))
+            left, right = forest.left[node], forest.right[node]
+            t_ = forest.threshold[node]
+            stack.append((left, {**path, f: (f_lo, min(f_hi, t_), f_z * forest.n_node_samples[left] / n)}))
+            stack.append((right, {**path, f: (max(f_lo, t_), f_hi, f_z * forest.n_node_samples[right] / n)}))
+
+    depth = max(1, max(map(len, feature)))
+    n_leaves = len(feature)
+    res = {
+        'feature': np.full((n_leaves, depth), forest.n_features),
+        'lo': np.full((n_leaves, depth), np.inf),
+        'hi': np.full((n_leaves, depth), np.inf),
+        'zero': np.ones((n_leaves, depth)),
+        'n_features': np.array([len(f) for f in feature]),
+        'value': np.array(value),
+    }
+    for l, f in enumerate(feature):
+        res['feature'][l, :len(f)] = f
+        res['lo'][l, :len(f)] = lo[l]
+        res['hi'][l, :len(f)] = hi[l]
+        res['zero'][l, :len(f)] = zero[l]
+    return res
+
+
+def _path_shap(paths: dict, X: np.ndarray, n_features: int) -> np.ndarray:
+    """
+    Sum over the leaves of paths of their Shapley values, for every row of
+    X (float32, with an extra zero column for the padding feature).
+    """
+    feature, z = paths['feature'], paths['zero']
+    n_leaves, depth = feature.shape
+    # Arrays are laid out (slot or degree, row, leaf) so that every step works on contiguous blocks
+    x = X[:, feature.T].transpose(1, 0, 2)
+    o = (x > paths['lo'].T[:, None]) & (x <= paths['hi'].T[:, None])
+    w = _shapley_weights(depth)[paths['n_features']].T
+
+    # Coefficients of prod_j (z_j + o_j t)
+    poly = np.zeros((depth + 1, len(X), n_leaves))
+    poly[0] = 1
+    for j in range(depth):
+        shifted = poly[:-1] * o[j]
+        poly *= z[:, j]
+        poly[1:] += shifted
+    # With o_i = 0 the factor is the constant z_i, the weighted sum of the
+    # quotient is the same for every i up to a division by z_i
+    weighted = (w[:, None] * poly[:-1]).sum(axis = 0)
+
+    phi = np.zeros((len(X), n_features + 1))
+    total = np.empty((len(X), n_leaves))
+    tmp = np.empty((len(X), n_leaves))
+    for i in range(depth):
+        z_i = z[:, i]
+        # Divide by (z_i + t) from the top
+        q = poly[depth].copy()
+        total[:] = 0
+        for k in range(depth - 1, -1, -1):
+            np.multiply(q, w[k], out = tmp)
+            total += tmp
+            if k:
+                np.multiply(q, z_i, out = tmp)
+                np.subtract(poly[k], tmp, out = q)
+        total = np.where(o[i], total, weighted / z_i)
+        contrib = paths['value'] * (o[i] - z_i) * total
+        onehot = feature[:, i, None] == np.arange(n_features + 1)
+        phi += contrib @ onehot
+    return phi[:, :n_features]
+
+
+class ForestExplainer:
+    """
+    Path-dependent TreeSHAP of a regression forest over its flattened
+    arrays. Leaf paths are extracted once and the leaves of all trees are
+    grouped by number of distinct features on their path, in blocks of at
+    most block leaves, so that no work is spent on padding.
+    """
+
+    def __init__(self, forest: FlatForest, block: int = 2048, n_jobs: int | None = None):
+        self.forest = forest
+        self.n_jobs = n_jobs
+        paths = leaf_paths(forest, range(forest.n_trees))
+        self.expected_value = float(paths['value'] @ paths['zero'].prod(axis = 1)) / forest.n_trees
+        self.blocks = []
+        for d in np.unique(paths['n_features']):
+            leaves = np.flatnonzero(paths['n_features'] == d)
+            for start in range(0, len(leaves), block):
+                sel = leaves[start:start + block]
+                self.blocks.append({k: v[sel, :d] if v.ndim == 2 else v[sel] for k, v in paths.items()})
+
+    def shap_values(self, X, chunksize: int = 256) -> np.ndarray:
+        """
+        (n_rows, n_features) attributions, rows being processed chunksize at
+        a time to bound the size of the (depth, rows, leaves) working arrays.
+        """
+        X = self.forest._as_array(X)
+        # Extra column read by the padding slots of the paths
+        X = np.hstack([X, np.zeros((len(X), 1), dtype = np.float32)])
+        phi = np.empty((len(X), self.forest.n_features))
+        with ThreadPoolExecutor(self.n_jobs) as pool:
+            for start in range(0, len(X), chunksize):
+                rows = X[start:start + chunksize]
+                phis = pool.map(lambda p: _path_shap(p, rows, self.forest.n_features), self.blocks)
+                phi[start:start + chunksize] = sum(phis) / self.forest.n_trees
+        return phi
+
+
+class LinearExplainer:
+    """
+    Exact attributions of a linear model, with the mean of the background
+    rows as reference: coef * (x - mean).
+    """
+
+    def __init__(self, predictor: Predictor, background: np.ndarray | None = None):
+        self.predictor = predictor
+        self.mean = np.zeros(len(predictor.coef)) if background is None else predictor.as_array(background).mean(axis = 0)
+        self.expected_value = float(self.mean @ predictor.coef + predictor.intercept)
+
+    def shap_values(self, X) -> np.ndarray:
+        return (self.predictor.as_array(X) - self.mean) * self.predictor.coef
+
+
+def explainer_for(predictor: Predictor, background = None, **kwargs) -> ForestExplainer | LinearExplainer:
+    """
+    The explainer matching the model of predictor. Linear models need
+    background rows (e.g. the training data) for their reference point.
+    """
+    if predictor.is_linear:
+        return LinearExplainer(predictor, background)
+    forest = FlatForest.from_sklearn(predictor.model)
+    forest.feature_names = predictor.feature_names
+    return ForestExplainer(forest, **kwargs)
+
+
+def top_attributions(explainer, X, feature_names: list[str], k: int = 10) -> pd.DataFrame:
+    """
+    The k largest attributions (in absolute value) of every row of X, in
+    long format: row, cols, value, shap.
+    """
+    X_arr = np.asarray(X[feature_names] if hasattr(X, 'columns') else X, dtype = np.float64)
+    phi = explainer.shap_values(X)
+    top = np.argsort(-np.abs(phi), axis = 1)[:, :k]
+    rows = np.repeat(np.arange(len(phi)), top.shape[1])
+    cols = top.ravel()
+    return pd.DataFrame({
+        'row': rows,
+        'cols': np.asarray(feature_names, dtype = object)[cols],
+        'value': X_arr[rows, cols],
+        'shap': phi[rows, cols],
+    })
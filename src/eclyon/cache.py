@@ -0,0 +1,164 @@
+from collections import OrderedDict
+import hashlib
+import sqlite3
+import sys
+import threading
+import time
+import numpy as np
+
+
+def fingerprint(*objs) -> str:
+    """
+    Stable hex digest of models, arrays, frames and plain python values, used
+    to key on-disk caches so that they are invalidated when any input changes.
+    """
+    import joblib
+    # Objects can only be frames if pandas has already been imported
+    pd = sys.modules.get('pandas')
+    h = hashlib.sha1()
+    for obj in objs:
+        if isinstance(obj, np.ndarray):
+            h.update(f'{obj.dtype}{obj.shape}'.encode())
+            h.update(np.ascontiguousarray(obj).data)
+        elif pd is not None and isinstance(obj, (pd.DataFrame, pd.Series)):
+            h.update(joblib.hash(list(obj.columns) if hasattr(obj, 'columns') else [obj.name]).encode())
+            h.update(pd.util.hash_pandas_object(obj, index = False).to_numpy().data)
+        else:
+            h.update(joblib.hash(obj).encode())
+    return h.hexdigest()
+
+
+def file_fingerprint(path, block_size: int = 2**20) -> str:
+    """
+    Hex digest of the content of a file, e.g. the version of a pickled model.
+    """
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        while block := f.read(block_size):
+            h.update(block)
+    return h.hexdigest()
+
+
+class PredictionCache:
+    """
+    Prediction cache in front of a Predictor. Input rows are canonicalized
+    (feature order, float64, rounded, -0.0 folded to 0.0) and hashed. Queries
+    are served from an in-process LRU, then from a SQLite store shared by all
+    the processes pointing at the same file, and only the remaining rows are
+    scored, in one batch. Rows stored for another model version are dropped
+    when the store is opened, and the least recently used rows are evicted
+    once the store grows past max_bytes.
+    """
+
+    def __init__(
+        self,
+        predictor,
+        path = None,
+        version: str | None = None,
+        maxsize: int = 4096,
+        max_bytes: int = 64 * 2**20,
+        decimals: int = 9,
+        ):
+        self.predictor = predictor
+        self.version = version or fingerprint(predictor.model)
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.decimals = decimals
+        self.memory = OrderedDict()
+        self.hits_memory = self.hits_disk = self.misses = 0
+        self.lock = threading.Lock()
+        self.db = None
+        if path is not None:
+            self.db = sqlite3.connect(path, check_same_thread = False)
+            # Stores created before rows were keyed by version too are dropped, they are only a cache
+            primary = [r[1] for r in self.db.execute('PRAGMA table_info(predictions)') if r[5]]
+            if primary and primary != ['key', 'version']:
+                self.db.execute('DROP TABLE predictions')
+            self.db.execute(
+                'CREATE TABLE IF NOT EXISTS predictions '
+                '(key TEXT, version TEXT, value REAL, last_used REAL, PRIMARY KEY (key, version))'
+            )
+            self.db.execute('DELETE FROM predictions WHERE version != ?', (self.version,))
+            self.db.commit()
+
+    @classmethod
+    def for_model(cls, model_path, path = None, **kwargs) -> 'PredictionCache':
+        """
+        Cache for the model pickled at model_path, versioned by the file content.
+        """
+        from eclyon.predict import Predictor
+        return cls(Predictor.load(model_path), path = path, version = file_fingerprint(model_path), **kwargs)
+
+    def keys(self, X: np.ndarray) -> list[str]:
+        X = np.round(X, self.decimals) + 0.0
+        return [hashlib.blake2b(row.tobytes(), digest_size = 16).hexdigest() for row in np.ascontiguousarray(X)]
+
+    def _remember(self, key: str, value: float) -> None:
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.maxsize:
+            self.memory.popitem(last = False)
+
+    def _from_disk(self, keys: list[str]) -> dict:
+        found = {}
+        for i in range(0, len(keys), 500):
+            batch = keys[i:i + 500]
+            found.update(self.db.execute(
+                f'SELECT key, value FROM predictions WHERE version = ? AND key IN ({",".join("?" * len(batch))})',
+                [self.version, *batch],
+            ).fetchall())
+        if found:
+            now = time.time()
+            self.db.executemany(
+                'UPDATE predictions SET last_used = ? WHERE key = ? AND version = ?',
+                [(now, k, self.version) for k in found],
+            )
+        return found
+
+    def _to_disk(self, items: list[tuple[str, float]]) -> None:
+        now = time.time()
+        self.db.executemany(
+            'INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?)',
+            [(k, self.version, v, now) for k, v in items],
+        )
+        page_size, pages, free = (
+            self.db.execute(f'PRAGMA {p}').fetchone()[0] for p in ('page_size', 'page_count', 'freelist_count')
+        )
+        if (pages - free) * page_size > self.max_bytes:
+            # Drop the least recently used quarter of the rows
+            self.db.execute(
+                'DELETE FROM predictions WHERE rowid IN '
+                '(SELECT rowid FROM predictions ORDER BY last_used LIMIT (SELECT COUNT(*) / 4 FROM predictions))'
+            )
+
+    def predict(self, X) -> np.ndarray:
+        X = self.predictor.as_array(X)
+        keys = self.keys(X)
+        pred = np.empty(len(keys))
+        with self.lock:
+            missing = []
+            for i, k in enumerate(keys):
+                if k in self.memory:
+                    pred[i] = self.memory[k]
+                    self.memory.move_to_end(k)
+                    self.hits_memory += 1
+                else:
+                    missing.append(i)
+            if missing and self.db is not None:
+                found = self._from_disk([keys[i] for i in missing])
+                self.hits_disk += len(found)
+                for i in missing:
+                    if keys[i] in found:
+                        pred[i] = found[keys[i]]
+                        self._remember(keys[i], pred[i])
+                missing = [i for i in missing if keys[i] not in found]
+            if missing:
+                self.misses += len(missing)
+                pred[missing] = self.predictor.predict(X[missing])
+                for i in missing:
+                    self._remember(keys[i], float(pred[i]))
+                if self.db is not None:
+                    self._to_disk([(keys[i], float(pred[i])) for i in missing])
+            if self.db is not None:
+                self.db.commit()
+        return pred
@@ -0,0 +1,151 @@
+from functools import cached_property
+from pathlib import Path
+from typing import TYPE_CHECKING, Mapping
+import json
+import numpy as np
+
+# pandas is only needed for frames: single rows are encoded without it, so
+# that the demo and the server do not pay for importing it
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+class CategoryEncoder:
+    """
+    Fitted value -> code mappings of the string columns, saved next to the
+    model so that serving applies exactly the training encoding. Codes are
+    the positions of the values in their sorted categories, as LabelEncoder
+    does. Nothing is fitted at serving time: single rows go through plain
+    dict lookups and batches through a vectorized index lookup.
+    """
+
+    def __init__(self, categories: Mapping[str, list]):
+        self.categories = {n: list(v) for n, v in categories.items()}
+        self.codes = {n: {v: i for i, v in enumerate(values)} for n, values in self.categories.items()}
+        # Values met by categorize that are not in the categories, with their count
+        self.unseen = {n: {} for n in self.categories}
+
+    @cached_property
+    def indexes(self) -> dict:
+        import pandas as pd
+        return {n: pd.Index(values) for n, values in self.categories.items()}
+
+    @cached_property
+    def dtypes(self) -> dict:
+        import pandas as pd
+        return {n: pd.CategoricalDtype(index, ordered = True) for n, index in self.indexes.items()}
+
+    @classmethod
+    def fit(cls, df: 'pd.DataFrame', columns: list[str] | None = None) -> 'CategoryEncoder':
+        from pandas.api.types import is_numeric_dtype
+        if columns is None:
+            columns = [n for n, c in df.items() if not is_numeric_dtype(c)]
+        return cls({n: sorted(df[n].dropna().unique()) for n in columns})
+
+    @classmethod
+    def from_template(cls, trn: 'pd.DataFrame') -> 'CategoryEncoder':
+        """
+        Build the mappings from the categorical columns of a training frame,
+        keeping the order of their categories.
+        """
+        import pandas as pd
+        return cls({n: c.cat.categories.tolist() for n, c in trn.items() if isinstance(c.dtype, pd.CategoricalDtype)})
+
+    @classmethod
+    def from_label_encoders(cls, label_encoders: Mapping) -> 'CategoryEncoder':
+        """
+        Build the mappings from the fitted LabelEncoder of every column.
+        """
+        return cls({n: le.classes_.tolist() for n, le in label_encoders.items()})
+
+    def encode_value(self, name: str, value):
+        """
+        Code of value in column name; values that are already numeric are
+        assumed to be encoded and returned unchanged.
+        """
+        if name not in self.codes or not isinstance(value, str):
+            return value
+        try:
+            return self.codes[name][value]
+        except KeyError:
+            raise ValueError(f'Unknown value {value!r} for {name}, expected one of {self.categories[name]}') from None
+
+    def encode_row(self, row: Mapping) -> dict:
+        return {n: self.encode_value(n, v) for n, v in row.items()}
+
+    def lookup(self, name: str, col: 'pd.Series') -> tuple[np.ndarray, dict]:
+        """
+        Codes of the values of col in the categories of column name, -1 for
+        missing and unknown values, and the count of every unknown value.
+        Only the distinct values of col are looked up in the hash table.
+        """
+        import pandas as pd
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            codes, uniques = col.cat.codes.to_numpy(), col.cat.categories
+        else:
+            codes, uniques = pd.factorize(col)
+        table = self.indexes[name].get_indexer(uniques)
+        missing = np.flatnonzero(table < 0)
+        unseen = {}
+        if len(missing):
+            counts = np.bincount(codes[codes >= 0], minlength = len(uniques))
+            unseen = {uniques[i]: int(counts[i]) for i in missing if counts[i]}
+        # Missing values have code -1, which picks the appended -1
+        return np.append(table, -1)[codes], unseen
+
+    def transform(self, df: 'pd.DataFrame') -> 'pd.DataFrame':
+        """
+        Encode the string columns of df, in a shallow copy.
+        """
+        from pandas.api.types import is_numeric_dtype
+        df = df.copy(deep = False)
+        for n in self.indexes:
+            if n in df.columns and not is_numeric_dtype(df[n]):
+                codes, _ = self.lookup(n, df[n])
+                if (codes < 0).any():
+                    unknown = sorted(map(str, set(df[n][codes < 0])))
+                    raise ValueError(f'Unknown values {unknown} for {n}, expected one of {self.categories[n]}')
+                df[n] = codes.astype(np.int64)
+        return df
+
+    def categorize(self, df: 'pd.DataFrame', inplace: bool = False) -> 'pd.DataFrame':
+        """
+        Turn the columns of df into ordered categoricals with the training
+        categories. Unknown values become missing and are counted in unseen,
+        over all the batches seen by the encoder.
+        """
+        import pandas as pd
+        if not inplace:
+            df = df.copy(deep = False)
+        for n in self.indexes:
+            if n in df.columns:
+                codes, unseen = self.lookup(n, df[n])
+                for v, count in unseen.items():
+                    self.unseen[n][v] = self.unseen[n].get(v, 0) + count
+                df[n] = pd.Categorical.from_codes(codes, dtype = self.dtypes[n])
+        return df
+
+    def unseen_report(self) -> 'pd.DataFrame':
+        """
+        Unknown values met by categorize, most frequent first.
+        """
+        import pandas as pd
+        report = pd.DataFrame(
+            [(n, v, count) for n, values in self.unseen.items() for v, count in values.items()],
+            columns = ['cols', 'value', 'count'],
+        )
+        return report.sort_values('count', ascending = False, ignore_index = True)
+
+    def save(self, path) -> None:
+        Path(path).write_text(json.dumps(self.categories, indent = 2))
+
+    @classmethod
+    def load(cls, path) -> 'CategoryEncoder':
+        return cls(json.loads(Path(path).read_text()))
+
+
+def encoder_path(model_path) -> Path:
+    """
+    Location of the category mappings saved with the model at model_path.
+    """
+    return Path(model_path).with_suffix('.categories.json')
@@ -0,0 +1,101 @@
+import json
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_numeric_dtype
+
+from eclyon.stream import read_csv_chunks
+
+
+def convert_csv(csv_path, out_dir, y_field: str | None = 'Lap_Time_s', chunksize: int = 100_000) -> Path:
+    """
+    Convert a csv file to a columnar dataset in out_dir: the label encoded
+    numeric features as a column-major (Fortran ordered) float64 X.npy, the
+    target as y.npy, and a schema.json holding the column names and the
+    category mapping of every string column. Categories are sorted, so codes
+    are those of LabelEncoder. The csv is read twice in chunks, once to count
+    rows and collect levels, once to fill the memory-mapped output.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents = True, exist_ok = True)
+
+    n_rows, columns, levels = 0, None, {}
+    for chunk in read_csv_chunks(csv_path, chunksize = chunksize):
+        if columns is None:
+            columns = [n for n in chunk.columns if n != y_field]
+            levels = {n: set() for n in columns if not is_numeric_dtype(chunk[n])}
+        for n, seen in levels.items():
+            seen.update(chunk[n].dropna().unique())
+        n_rows += len(chunk)
+    categories = {n: sorted(seen) for n, seen in levels.items()}
+
+    X = np.lib.format.open_memmap(
+        out_dir / 'X.npy', mode = 'w+', dtype = np.float64, shape = (n_rows, len(columns)), fortran_order = True,
+    )
+    y = None
+    if y_field is not None:
+        y = np.lib.format.open_memmap(out_dir / 'y.npy', mode = 'w+', dtype = np.float64, shape = (n_rows,))
+    start = 0
+    for chunk in read_csv_chunks(csv_path, chunksize = chunksize):
+        stop = start + len(chunk)
+        for j, n in enumerate(columns):
+            if n in categories:
+                X[start:stop, j] = pd.Categorical(chunk[n], categories = categories[n]).codes
+            else:
+                X[start:stop, j] = chunk[n].to_numpy(dtype = np.float64)
+        if y is not None:
+            y[start:stop] = chunk[y_field].to_numpy(dtype = np.float64)
+        start = stop
+    X.flush()
+    if y is not None:
+        y.flush()
+
+    schema = {'n_rows': n_rows, 'columns': columns, 'target': y_field, 'categories': categories}
+    (out_dir / 'schema.json').write_text(json.dumps(schema, indent = 2))
+    return out_dir
+
+
+class ColumnarDataset:
+    """
+    Read side of convert_csv. X and y are memory-mapped, so opening the
+    dataset reads nothing but the schema, and since X is column-major a
+    subset of columns only touches the pages of those columns.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        schema = json.loads((self.path / 'schema.json').read_text())
+        self.columns = schema['columns']
+        self.target = schema['target']
+        self.categories = schema['categories']
+        self.n_rows = schema['n_rows']
+        self.X = np.load(self.path / 'X.npy', mmap_mode = 'r')
+        self.y = np.load(self.path / 'y.npy', mmap_mode = 'r') if self.target is not None else None
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        Zero-copy view on one column.
+        """
+        return self.X[:, self.columns.index(name)]
+
+    def select(self, columns: list[str]) -> np.ndarray:
+        """
+        (n_rows, len(columns)) array of a subset of the columns. A contiguous
+        run of columns is a zero-copy view, any other subset is gathered.
+        """
+        idx = [self.columns.index(n) for n in columns]
+        if idx == list(range(idx[0], idx[0] + len(idx))):
+            return self.X[:, idx[0]:idx[0] + len(idx)]
+        return self.X[:, idx]
+
+    def frame(self, columns: list[str] | None = None) -> pd.DataFrame:
+        columns = self.columns if columns is None else columns
+        return pd.DataFrame({n: self.column(n) for n in columns}, copy = False)
+
+    def decode(self, name: str, codes: np.ndarray) -> np.ndarray:
+        """
+        Map the codes of a category column back to its string values, the
+        code -1 of missing values back to NaN.
+        """
+        values = np.append(np.asarray(self.categories[name], dtype = object), np.nan)
+        return values[np.asarray(codes, dtype = np.int64)]
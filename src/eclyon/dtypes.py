@@ -0,0 +1,103 @@
+import json
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_integer_dtype, is_float_dtype
+
+
+INT_DTYPES = ['int8', 'int16', 'int32', 'int64']
+
+
+def _smallest_int(lo, hi) -> str:
+    return next(t for t in INT_DTYPES if np.iinfo(t).min <= lo and hi <= np.iinfo(t).max)
+
+
+def infer_column_dtype(col: pd.Series, float_rtol: float = 1e-6) -> dict:
+    """
+    Minimal safe dtype of a column: the smallest integer type holding its
+    range for integer (or integral float) columns, float32 for floats when
+    the round trip stays within float_rtol, and category for anything else.
+    """
+    if is_bool_dtype(col):
+        return {'dtype': 'bool'}
+    if is_integer_dtype(col) or is_float_dtype(col):
+        values = col.to_numpy()
+        if not len(values) or col.hasnans:
+            return {'dtype': 'float32' if is_float_dtype(col) and _fits_float32(values, float_rtol) else str(col.dtype)}
+        if is_integer_dtype(col) or np.array_equal(values, np.round(values)):
+            return {'dtype': _smallest_int(values.min(), values.max())}
+        return {'dtype': 'float32' if _fits_float32(values, float_rtol) else 'float64'}
+    categories = col.cat.categories if isinstance(col.dtype, pd.CategoricalDtype) else pd.Categorical(col).categories
+    return {'dtype': 'category', 'categories': categories.tolist()}
+
+
+def _fits_float32(values: np.ndarray, float_rtol: float) -> bool:
+    values = values[~np.isnan(values)]
+    if np.abs(values).max(initial = 0) > np.finfo(np.float32).max:
+        return False
+    return np.allclose(values.astype(np.float32), values, rtol = float_rtol, atol = 0)
+
+
+def infer_schema(df: pd.DataFrame, float_rtol: float = 1e-6) -> dict:
+    """
+    Map every column of df to its minimal safe dtype (see infer_column_dtype).
+    """
+    return {n: infer_column_dtype(c, float_rtol) for n, c in df.items()}
+
+
+def apply_schema(df: pd.DataFrame, schema: dict) -> pd.DataFrame:
+    """
+    Cast the columns of df listed in schema, building the new frame in one
+    pass. Integer casts are checked for whole values within range so that
+    serving data is never truncated nor wraps around silently, and category
+    columns use the stored categories, values unseen at inference time
+    becoming NaN.
+    """
+    data = {}
+    for n, c in df.items():
+        spec = schema.get(n)
+        if spec is None:
+            data[n] = c
+        elif spec['dtype'] == 'category':
+            data[n] = pd.Categorical(c, categories = spec['categories'])
+        else:
+            if spec['dtype'] in INT_DTYPES and len(c):
+                info = np.iinfo(spec['dtype'])
+                if c.hasnans or c.min() < info.min or c.max() > info.max:
+                    raise ValueError(f'Column {n} does not fit in {spec["dtype"]}')
+                if is_float_dtype(c) and not np.array_equal(c.to_numpy(), np.round(c.to_numpy())):
+                    raise ValueError(f'Column {n} has fractional values, expected {spec["dtype"]}')
+            data[n] = c.to_numpy().astype(spec['dtype'], copy = False)
+    return pd.DataFrame(data, index = df.index, copy = False)
+
+
+def optimize_dtypes(df: pd.DataFrame, float_rtol: float = 1e-6) -> tuple[pd.DataFrame, dict]:
+    """
+    Infer the schema of df and apply it, returning the compact frame and the
+    schema to reuse on serving data.
+    """
+    schema = infer_schema(df, float_rtol)
+    return apply_schema(df, schema), schema
+
+
+def memory_report(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    """
+    Memory used by every column of before and after, in bytes, with a total row.
+    """
+    report = pd.DataFrame({
+        'dtype_before': before.dtypes.astype(str),
+        'dtype_after': after.dtypes.astype(str),
+        'bytes_before': before.memory_usage(index = False, deep = True),
+        'bytes_after': after.memory_usage(index = False, deep = True),
+    })
+    report.loc['Total'] = ['', '', report['bytes_before'].sum(), report['bytes_after'].sum()]
+    report['ratio'] = report['bytes_after'] / report['bytes_before']
+    return report
+
+
+def save_schema(schema: dict, path) -> None:
+    Path(path).write_text(json.dumps(schema, indent = 2, default = lambda v: v.item()))
+
+
+def load_schema(path) -> dict:
+    return json.loads(Path(path).read_text())
@@ -1,7 +1,11 @@
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import pandas as pd
 
+from eclyon.instrument import instrumented
 
+
+@instrumented
 def rf_feat_importance(model, df):
     feat_importance = pd.DataFrame({
         'cols': df.columns, 
@@ -10,40 +14,69 @@ def rf_feat_importance(model, df):
     return feat_importance.sort_values('imp', ascending = False)
 
 
-def rf_unfolded_feat_importance(model, df):
-    feat_importance = pd.DataFrame({
-        'cols': df.columns, 
-        'imp': model.feature_importances_,
-    })
-    for i, tree in enumerate(model.estimators_):
-        feat_importance['imp_' + str(i)] = tree.feature_importances_
+@instrumented
+def rf_unfolded_feat_importance(model, df, n_jobs = None):
+    imps = forest_feature_importance(model, n_jobs = n_jobs)
+    feat_importance = pd.concat([
+        pd.DataFrame({'cols': df.columns, 'imp': model.feature_importances_}),
+        pd.DataFrame(imps.T, columns = [f'imp_{i}' for i in range(len(imps))]),
+    ], axis = 1)
     return feat_importance.sort_values('imp', ascending = False)
 
 
+@instrumented
 def tree_feature_importance(model, normalize = True):
-    left_c = model.tree_.children_left
-    right_c = model.tree_.children_right
-
-    impurity = model.tree_.impurity    
-    node_samples = model.tree_.weighted_n_node_samples 
+    tree = model.tree_
+    left_c = tree.children_left
+    right_c = tree.children_right
 
-    # Initialize the feature importance, those not used remain zero
-    feature_importance = np.zeros((model.tree_.n_features,))
+    # Impurity decrease of every split node, weighted by its number of samples
+    weighted_impurity = tree.impurity * tree.weighted_n_node_samples
+    split = np.flatnonzero(tree.feature >= 0)
+    decrease = (
+        weighted_impurity[split]
+        - weighted_impurity[left_c[split]]
+        - weighted_impurity[right_c[split]]
+    )
 
-    for idx, node in enumerate(model.tree_.feature):
-        if node >= 0:
-            # Accumulate the feature importance over all the nodes where it's used
-            feature_importance[node] += (
-                impurity[idx]*node_samples[idx] -
-                impurity[left_c[idx]]*node_samples[left_c[idx]] -
-                impurity[right_c[idx]]*node_samples[right_c[idx]])
+    # Accumulate the feature importance over all the nodes where it's used,
+    # those not used remain zero
+    feature_importance = np.bincount(
+        tree.feature[split], weights = decrease, minlength = tree.n_features,
+    )
 
     # Number of samples at the root node
-    feature_importance /= node_samples[0]
+    feature_importance /= tree.weighted_n_node_samples[0]
 
     if normalize:
         normalizer = feature_importance.sum()
         if normalizer > 0:
             feature_importance /= normalizer
 
-    return feature_importance
\ No newline at end of file
+    return feature_importance
+
+
+@instrumented
+def forest_feature_importance(model, normalize = True, n_jobs = None) -> np.ndarray:
+    """
+    Impurity based importance of every tree of a forest, as a compact
+    (n_trees, n_features) array. Trees are processed in a thread pool, the
+    work being done in numpy.
+    """
+    with ThreadPoolExecutor(n_jobs) as pool:
+        imps = pool.map(lambda tree: tree_feature_importance(tree, normalize), model.estimators_)
+        return np.vstack(list(imps))
+
+
+@instrumented
+def importance_summary(importances: np.ndarray, columns) -> pd.DataFrame:
+    """
+    Mean and standard deviation over the trees of a (n_trees, n_features)
+    importance array, sorted by decreasing mean.
+    """
+    summary = pd.DataFrame({
+        'cols': columns,
+        'imp': importances.mean(axis = 0),
+        'std': importances.std(axis = 0),
+    })
+    return summary.sort_values('imp', ascending = False)
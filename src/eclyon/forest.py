@@ -0,0 +1,250 @@
+import json
+from pathlib import Path
+import numpy as np
+
+
+class FlatForest:
+    """
+    Regression trees of a fitted forest (or of a single tree) flattened into
+    contiguous arrays indexed by a global node id. Trees are stored one after
+    the other, roots[t] being the id of the root of tree t. Leaves have
+    feature -2, as in sklearn, and point to themselves as children, so that a
+    batch of rows can be pushed down every tree level by level without
+    branching. Only numpy is needed to load and evaluate it.
+    """
+
+    ARRAYS = ('feature', 'threshold', 'left', 'right', 'value', 'impurity', 'n_node_samples', 'roots')
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        value: np.ndarray,
+        impurity: np.ndarray,
+        n_node_samples: np.ndarray,
+        roots: np.ndarray,
+        n_features: int,
+        max_depth: int,
+        feature_names: list[str] | None = None,
+        ):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.impurity = impurity
+        self.n_node_samples = n_node_samples
+        self.roots = roots
+        self.n_features = n_features
+        self.max_depth = max_depth
+        self.feature_names = feature_names
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    def tree_nodes(self, t: int) -> slice:
+        """
+        Slice of the global node ids belonging to tree t.
+        """
+        stop = self.roots[t + 1] if t + 1 < self.n_trees else self.n_nodes
+        return slice(int(self.roots[t]), int(stop))
+
+    def depths(self) -> np.ndarray:
+        """
+        Depth of every node in its tree, computed level by level.
+        """
+        depth = np.zeros(self.n_nodes, dtype = np.int64)
+        frontier = np.asarray(self.roots)
+        for d in range(1, self.max_depth + 1):
+            frontier = frontier[self.feature[frontier] >= 0]
+            frontier = np.concatenate([self.left[frontier], self.right[frontier]])
+            depth[frontier] = d
+        return depth
+
+    @classmethod
+    def from_sklearn(cls, model) -> 'FlatForest':
+        """
+        Flatten a fitted sklearn regression forest or decision tree.
+        """
+        trees = [e.tree_ for e in getattr(model, 'estimators_', [model])]
+        sizes = np.array([t.node_count for t in trees])
+        roots = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+        left, right = [], []
+        for t, root in zip(trees, roots):
+            own = np.arange(t.node_count) + root
+            is_leaf = t.children_left < 0
+            left.append(np.where(is_leaf, own, t.children_left + root))
+            right.append(np.where(is_leaf, own, t.children_right + root))
+        names = getattr(model, 'feature_names_in_', None)
+        return cls(
+            feature = np.concatenate([t.feature for t in trees]).astype(np.int64),
+            threshold = np.concatenate([t.threshold for t in trees]).astype(np.float64),
+            left = np.concatenate(left).astype(np.int64),
+            right = np.concatenate(right).astype(np.int64),
+            value = np.concatenate([t.value[:, 0, 0] for t in trees]).astype(np.float64),
+            impurity = np.concatenate([t.impurity for t in trees]).astype(np.float64),
+            n_node_samples = np.concatenate([t.weighted_n_node_samples for t in trees]).astype(np.float64),
+            roots = roots,
+            n_features = int(trees[0].n_features),
+            max_depth = int(max(t.max_depth for t in trees)),
+            feature_names = None if names is None else list(names),
+        )
+
+    def save(self, path) -> None:
+        """
+        Store the forest in directory path, one .npy file per array, so that
+        it can be memory-mapped and shared by several processes.
+        """
+        path = Path(path)
+        path.mkdir(parents = True, exist_ok = True)
+        for n in self.ARRAYS:
+            np.save(path / f'{n}.npy', np.ascontiguousarray(getattr(self, n)))
+        meta = {'n_features': self.n_features, 'max_depth': self.max_depth, 'feature_names': self.feature_names}
+        (path / 'meta.json').write_text(json.dumps(meta))
+
+    @classmethod
+    def load(cls, path, mmap: bool = True) -> 'FlatForest':
+        path = Path(path)
+        arrays = {n: np.load(path / f'{n}.npy', mmap_mode = 'r' if mmap else None) for n in cls.ARRAYS}
+        return cls(**arrays, **json.loads((path / 'meta.json').read_text()))
+
+    def _as_array(self, X) -> np.ndarray:
+        if self.feature_names is not None and hasattr(X, 'columns'):
+            X = X[self.feature_names]
+        # sklearn evaluates the splits on float32 inputs
+        return np.asarray(X, dtype = np.float32)
+
+    def apply(self, X, trees: slice = slice(None)) -> np.ndarray:
+        """
+        Leaf reached by every row in every tree of the slice, as a
+        (n_trees, n_rows) array of global node ids.
+        """
+        X = self._as_array(X)
+        rows = np.arange(len(X))
+        nodes = np.repeat(np.asarray(self.roots[trees])[:, None], len(X), axis = 1)
+        feature = np.maximum(self.feature, 0)
+        for _ in range(self.max_depth):
+            go_left = X[rows, feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def predict_trees(self, X, trees: slice = slice(None)) -> np.ndarray:
+        """
+        Prediction of every tree of the slice, as a (n_trees, n_rows) array.
+        """
+        return self.value[self.apply(X, trees)]
+
+    def predict(self, X, block: int = 16) -> np.ndarray:
+        """
+        Mean prediction of the trees, evaluated block trees at a time so that
+        the working memory stays (block, n_rows).
+        """
+        X = self._as_array(X)
+        total = np.zeros(len(X))
+        for start in range(0, self.n_trees, block):
+            total += self.predict_trees(X, slice(start, start + block)).sum(axis = 0)
+        return total / self.n_trees
+
+    def predict_dist(
+        self,
+        X,
+        quantiles: tuple[float, ...] = (0.05, 0.5, 0.95),
+        bins: int = 32,
+        passes: int = 3,
+        block: int = 16,
+        ) -> dict[str, np.ndarray]:
+        """
+        Mean, variance and quantiles of the tree predictions of every row,
+        over blocks of trees, without holding the (n_trees, n_rows)
+        predictions. Mean and variance are merged block by block (Welford /
+        Chan) in the first pass. Quantiles are located by successive passes:
+        each one counts, per row and order statistic, the predictions falling
+        in bins small-integer bins of the bin found by the previous pass, so
+        that after passes passes they are known to within
+        (max - min leaf value) / bins ** passes. Beyond the (block, n_rows)
+        predictions of the current block, memory is (n_rows, bins) small
+        integer counts per order statistic.
+        """
+        X = self._as_array(X)
+        n_rows = len(X)
+        count = self.n_trees
+        lo, hi = float(self.value.min()), float(self.value.max())
+        n_codes = bins ** passes
+        scale = n_codes / (hi - lo) if hi > lo else 0.0
+        # Ranks of the order statistics interpolated by np.quantile
+        ranks = sorted({k for q in quantiles for k in (int(q * (count - 1)), min(int(q * (count - 1)) + 1, count - 1))})
+        prefix = {k: np.zeros(n_rows, dtype = np.int64) for k in ranks}
+        rank = {k: np.full(n_rows, k, dtype = np.int64) for k in ranks}
+        in_bin = {}
+        dtype = np.uint8 if count < 2 ** 8 else np.uint16 if count < 2 ** 16 else np.uint32
+        rows = np.arange(n_rows)
+
+        mean = np.zeros(n_rows)
+        m2 = np.zeros(n_rows)
+        for p in range(passes):
+            shift = bins ** (passes - p - 1)
+            counts = {k: np.zeros((n_rows, bins), dtype = dtype) for k in ranks}
+            seen = 0
+            for start in range(0, count, block):
+                values = self.predict_trees(X, slice(start, start + block))
+                if p == 0:
+                    n = len(values)
+                    block_mean = values.mean(axis = 0)
+                    delta = block_mean - mean
+                    total = seen + n
+                    mean += delta * n / total
+                    m2 += ((values - block_mean) ** 2).sum(axis = 0) + delta ** 2 * seen * n / total
+                    seen = total
+                # Index of every prediction among the n_codes finest bins, then at this pass
+                values -= lo
+                values *= scale
+                digits = values.astype(np.int64)
+                del values
+                np.minimum(digits, n_codes - 1, out = digits)
+                digits //= shift
+                # Bin of this pass, flattened into the (n_rows, bins) counts, and bin of the previous ones
+                flat = digits % bins
+                flat += rows * bins
+                digits //= bins
+                for k in ranks:
+                    np.add.at(counts[k].reshape(-1), flat[digits == prefix[k]], 1)
+                del flat, digits
+            for k in ranks:
+                cum = np.cumsum(counts[k], axis = 1, dtype = np.int64)
+                b = (cum <= rank[k][:, None]).sum(axis = 1)
+                before = np.where(b > 0, cum[rows, np.maximum(b - 1, 0)], 0)
+                rank[k] -= before
+                in_bin[k] = cum[rows, b] - before
+                prefix[k] = prefix[k] * bins + b
+
+        def order_statistic(k: int) -> np.ndarray:
+            # k-th smallest tree prediction, spread evenly within its finest bin
+            if not scale:
+                return np.full(n_rows, lo)
+            return lo + (prefix[k] + (rank[k] + 0.5) / in_bin[k]) / scale
+
+        res = {'mean': mean, 'var': m2 / count}
+        for q in quantiles:
+            # Same interpolation between order statistics as np.quantile
+            pos = q * (count - 1)
+            k = int(pos)
+            low = order_statistic(k)
+            res[f'q{round(q * 100):g}'] = low + (pos - k) * (order_statistic(min(k + 1, count - 1)) - low)
+        return res
+
+
+def export_forest(model_path, out_path) -> FlatForest:
+    """
+    Flatten the pickled sklearn forest at model_path into the directory out_path.
+    """
+    import joblib
+    forest = FlatForest.from_sklearn(joblib.load(model_path))
+    forest.save(out_path)
+    return forest
@@ -0,0 +1,109 @@
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import os
+import tempfile
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+
+
+def share_training_data(X, y, folder) -> Path:
+    """
+    Write X (as the C-ordered float32 sklearn trees fit on) and y to folder,
+    to be memory-mapped by the workers instead of pickled to each of them.
+    """
+    folder = Path(folder)
+    np.save(folder / 'X.npy', np.ascontiguousarray(X, dtype = np.float32))
+    np.save(folder / 'y.npy', np.asarray(y, dtype = np.float64))
+    return folder
+
+
+def fit_trees(params: dict, folder, n_trees: int, seed: int) -> RandomForestRegressor:
+    """
+    Fit a forest of n_trees on the shared training data.
+    """
+    X = np.load(Path(folder) / 'X.npy', mmap_mode = 'r')
+    y = np.load(Path(folder) / 'y.npy', mmap_mode = 'r')
+    forest = RandomForestRegressor(**{**params, 'n_estimators': n_trees, 'random_state': seed, 'n_jobs': 1})
+    return forest.fit(X, y)
+
+
+class IncrementalForest:
+    """
+    Random forest grown by batches of trees. Each batch is fitted in a
+    process pool on memory-mapped training data, which can be a new chunk of
+    sessions or the whole data, and is appended to the forest, which is
+    checkpointed after every job. grow_to is idempotent: after an interrupted
+    run, calling it again with the same target only fits the missing trees.
+    """
+
+    def __init__(self, checkpoint, params: dict | None = None, seed: int = 42, n_jobs: int | None = None):
+        self.checkpoint = Path(checkpoint)
+        self.params = dict(params or {})
+        self.seed = seed
+        self.n_jobs = n_jobs
+        self.model = joblib.load(self.checkpoint) if self.checkpoint.exists() else None
+
+    @property
+    def n_estimators(self) -> int:
+        return 0 if self.model is None else len(self.model.estimators_)
+
+    def _append(self, forest: RandomForestRegressor, columns) -> None:
+        if self.model is None:
+            self.model = forest
+            if columns is not None:
+                # Workers fit on bare arrays, keep the names sklearn checks at predict time
+                self.model.feature_names_in_ = np.asarray(columns, dtype = object)
+        else:
+            self.model.estimators_ += forest.estimators_
+        self.model.set_params(n_estimators = len(self.model.estimators_), warm_start = True, n_jobs = None)
+        self._save()
+
+    def _check_features(self, X) -> None:
+        """
+        Raise if X does not have the columns, in the same order, of the trees
+        already in the forest: new trees are fitted on bare arrays.
+        """
+        if self.model is None:
+            return
+        names = getattr(self.model, 'feature_names_in_', None)
+        columns = getattr(X, 'columns', None)
+        if names is not None and columns is not None and list(columns) != list(names):
+            raise ValueError(
+                f'Columns of X do not match the features of the forest: expected {list(names)}, got {list(columns)}'
+            )
+        n_features = np.shape(X)[1]
+        if n_features != self.model.n_features_in_:
+            raise ValueError(f'X has {n_features} features, the forest was fitted on {self.model.n_features_in_}')
+
+    def _save(self) -> None:
+        tmp = self.checkpoint.with_name(self.checkpoint.name + '.tmp')
+        joblib.dump(self.model, tmp)
+        os.replace(tmp, self.checkpoint)
+
+    def grow_to(self, X, y, n_estimators: int, trees_per_job: int = 10) -> RandomForestRegressor:
+        """
+        Fit trees on (X, y) until the forest has n_estimators of them.
+        """
+        missing = n_estimators - self.n_estimators
+        if missing <= 0:
+            return self.model
+        self._check_features(X)
+        sizes = [min(trees_per_job, missing - start) for start in range(0, missing, trees_per_job)]
+        # Seeds only depend on the position of the batch in the forest, and
+        # batches are appended in order, so the forest always holds a prefix
+        # of the batches and a resumed run fits the trees that were missing
+        seeds = [self.seed + self.n_estimators + start for start in range(0, missing, trees_per_job)]
+        with tempfile.TemporaryDirectory() as tmp:
+            folder = share_training_data(X, y, tmp)
+            with ProcessPoolExecutor(self.n_jobs) as pool:
+                futures = [pool.submit(fit_trees, self.params, folder, n, s) for n, s in zip(sizes, seeds)]
+                for f in futures:
+                    self._append(f.result(), getattr(X, 'columns', None))
+        return self.model
+
+    def add_trees(self, X, y, n_trees: int, trees_per_job: int = 10) -> RandomForestRegressor:
+        """
+        Grow the forest by n_trees fitted on (X, y), e.g. a chunk of new sessions.
+        """
+        return self.grow_to(X, y, self.n_estimators + n_trees, trees_per_job)
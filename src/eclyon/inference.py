@@ -0,0 +1,71 @@
+"""
+Minimal inference path: models exported once with export_model are loaded
+and scored with numpy only, without importing sklearn, joblib or pandas.
+
+    export_model('final_model.pkl', 'final_model.npmodel')   # once, with sklearn
+    model = load_model('final_model.npmodel')                # in the batch job
+    model.predict(X)
+"""
+import json
+from pathlib import Path
+import numpy as np
+
+from eclyon.forest import FlatForest
+
+
+class LinearModel:
+    """
+    Coefficients and intercept of a fitted linear regressor.
+    """
+
+    def __init__(self, coef: np.ndarray, intercept: float, feature_names: list[str] | None = None):
+        self.coef = np.ascontiguousarray(coef, dtype = np.float64)
+        self.intercept = float(intercept)
+        self.feature_names = feature_names
+
+    @classmethod
+    def from_sklearn(cls, model) -> 'LinearModel':
+        names = getattr(model, 'feature_names_in_', None)
+        return cls(model.coef_, model.intercept_, None if names is None else list(names))
+
+    def save(self, path) -> None:
+        path = Path(path)
+        path.mkdir(parents = True, exist_ok = True)
+        np.save(path / 'coef.npy', self.coef)
+        meta = {'intercept': self.intercept, 'feature_names': self.feature_names}
+        (path / 'meta.json').write_text(json.dumps(meta))
+
+    @classmethod
+    def load(cls, path) -> 'LinearModel':
+        path = Path(path)
+        return cls(np.load(path / 'coef.npy'), **json.loads((path / 'meta.json').read_text()))
+
+    def predict(self, X) -> np.ndarray:
+        if self.feature_names is not None and hasattr(X, 'columns'):
+            X = X[self.feature_names]
+        return np.asarray(X, dtype = np.float64) @ self.coef + self.intercept
+
+
+def load_model(path) -> LinearModel | FlatForest:
+    """
+    Load a model exported with export_model.
+    """
+    path = Path(path)
+    if (path / 'coef.npy').exists():
+        return LinearModel.load(path)
+    return FlatForest.load(path)
+
+
+def export_model(model_path, out_path) -> LinearModel | FlatForest:
+    """
+    Export the pickled sklearn linear model or forest at model_path to the
+    directory out_path.
+    """
+    import joblib
+    model = joblib.load(model_path)
+    if getattr(model, 'coef_', None) is not None:
+        exported = LinearModel.from_sklearn(model)
+    else:
+        exported = FlatForest.from_sklearn(model)
+    exported.save(out_path)
+    return exported
@@ -0,0 +1,226 @@
+"""
+Opt-in instrumentation of the hot paths of eclyon.
+
+    with Profiler() as prof:
+        process_df(df, 'Lap_Time_s')
+    prof.flat_profile()
+    prof.save_chrome_trace('trace.json')   # open in chrome://tracing or Perfetto
+
+Functions decorated with @instrumented, and blocks wrapped in stage(), record
+their wall time, rows in and out, the memory allocated while they run
+(tracemalloc) and the number of DataFrame copies they make. When no Profiler
+is active the decorator costs a single flag check.
+
+tracemalloc counts the memory of the whole process and has a single peak,
+only tracked (and reset) by the stages of the thread that entered the
+Profiler: their alloc_bytes is the peak over the start of the stage. Stages
+of other threads (e.g. the workers of explain.py) record the net memory
+allocated between their start and end instead, so that they do not reset
+each other's peaks. Either figure includes what other threads allocate
+meanwhile: memory is only exact when stages run one at a time.
+"""
+from contextlib import contextmanager
+from functools import wraps
+import json
+import os
+import threading
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+
+_enabled = False
+_local = threading.local()
+_copies = [0]
+
+
+def _n_rows(obj) -> int | None:
+    if isinstance(obj, tuple) and obj:
+        obj = obj[0]
+    if isinstance(obj, (pd.DataFrame, pd.Series, np.ndarray)):
+        return len(obj)
+    return None
+
+
+class _Frame:
+
+    def __init__(self, name: str, rows_in: int | None):
+        self.name = name
+        self.rows_in = rows_in
+        self.max_peak = 0
+        self.copies = _copies[0]
+        self.start_mem = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+        self.start = time.perf_counter()
+
+
+def _stack() -> list:
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+
+def _tracks_peak() -> bool:
+    return tracemalloc.is_tracing() and threading.get_ident() == Profiler.active.thread
+
+
+def _enter(name: str, rows_in: int | None) -> _Frame:
+    stack = _stack()
+    if _tracks_peak():
+        # Keep the peak reached so far by the enclosing stage before resetting it
+        if stack:
+            stack[-1].max_peak = max(stack[-1].max_peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+    frame = _Frame(name, rows_in)
+    stack.append(frame)
+    return frame
+
+
+def _exit(frame: _Frame, rows_out: int | None) -> None:
+    end = time.perf_counter()
+    stack = _stack()
+    stack.pop()
+    alloc = 0
+    if _tracks_peak():
+        peak = max(frame.max_peak, tracemalloc.get_traced_memory()[1])
+        alloc = peak - frame.start_mem
+        if stack:
+            stack[-1].max_peak = max(stack[-1].max_peak, peak)
+    elif tracemalloc.is_tracing():
+        alloc = tracemalloc.get_traced_memory()[0] - frame.start_mem
+    Profiler.active.records.append({
+        'name': frame.name,
+        'start': frame.start,
+        'duration': end - frame.start,
+        'depth': len(stack),
+        'thread': threading.get_ident(),
+        'rows_in': frame.rows_in,
+        'rows_out': rows_out,
+        'alloc_bytes': alloc,
+        'copies': _copies[0] - frame.copies,
+    })
+
+
+@contextmanager
+def stage(name: str, df = None):
+    """
+    Record the enclosed block as a stage named name, df being its input.
+    """
+    if not _enabled:
+        yield
+        return
+    frame = _enter(name, _n_rows(df))
+    try:
+        yield
+    finally:
+        _exit(frame, None)
+
+
+def instrumented(fn = None, name: str | None = None):
+    """
+    Record every call of the decorated function as a stage. Rows in are
+    those of its first DataFrame, Series or array argument, rows out those
+    of its result (or of the first element of a returned tuple).
+    """
+    if fn is None:
+        return lambda fn: instrumented(fn, name)
+    label = name or fn.__qualname__
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return fn(*args, **kwargs)
+        rows_in = next((n for n in map(_n_rows, args) if n is not None), None)
+        frame = _enter(label, rows_in)
+        res = None
+        try:
+            res = fn(*args, **kwargs)
+            return res
+        finally:
+            _exit(frame, _n_rows(res))
+    return wrapper
+
+
+class Profiler:
+    """
+    Enable the instrumentation while active. Deep copies of frames (through
+    DataFrame.copy or copy.deepcopy) are counted by temporarily wrapping
+    DataFrame.copy, and tracemalloc is started unless trace_memory is False
+    (it slows allocations down).
+    """
+
+    active = None
+
+    def __init__(self, trace_memory: bool = True):
+        self.trace_memory = trace_memory
+        self.records = []
+
+    def __enter__(self) -> 'Profiler':
+        global _enabled
+        if Profiler.active is not None:
+            raise RuntimeError('A Profiler is already active')
+        Profiler.active, _enabled = self, True
+        self.thread = threading.get_ident()
+        self._copy = pd.DataFrame.copy
+        pd.DataFrame.copy = self._counting(self._copy)
+        self._started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start()
+        self.origin = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        global _enabled
+        if self._started_tracing:
+            tracemalloc.stop()
+        pd.DataFrame.copy = self._copy
+        Profiler.active, _enabled = None, False
+
+    @staticmethod
+    def _counting(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if kwargs.get('deep', args[0] if args else True):
+                _copies[0] += 1
+            return method(self, *args, **kwargs)
+        return wrapper
+
+    def flat_profile(self) -> pd.DataFrame:
+        """
+        One row per stage name: calls, total and mean wall time, rows and
+        allocated bytes, sorted by total time. Times are inclusive of nested stages.
+        """
+        if not self.records:
+            return pd.DataFrame()
+        df = pd.DataFrame(self.records)
+        profile = df.groupby('name').agg(
+            calls = ('duration', 'size'),
+            total_s = ('duration', 'sum'),
+            mean_s = ('duration', 'mean'),
+            rows_in = ('rows_in', 'sum'),
+            rows_out = ('rows_out', 'sum'),
+            alloc_mb = ('alloc_bytes', lambda a: a.max() / 2**20),
+            copies = ('copies', 'sum'),
+        )
+        return profile.sort_values('total_s', ascending = False)
+
+    def chrome_trace(self) -> dict:
+        """
+        The records as complete ('X') events of the Chrome trace event format.
+        """
+        return {'traceEvents': [
+            {
+                'name': r['name'],
+                'ph': 'X',
+                'ts': (r['start'] - self.origin) * 1e6,
+                'dur': r['duration'] * 1e6,
+                'pid': os.getpid(),
+                'tid': r['thread'],
+                'args': {k: r[k] for k in ('rows_in', 'rows_out', 'alloc_bytes', 'copies')},
+            }
+            for r in self.records
+        ]}
+
+    def save_chrome_trace(self, path) -> None:
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
@@ -0,0 +1,123 @@
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor, ExtraTreesRegressor
+from sklearn.linear_model import LinearRegression, Ridge, Lasso
+from sklearn.model_selection import KFold
+from sklearn.tree import DecisionTreeRegressor
+
+
+def default_candidates() -> dict:
+    """
+    The models compared in the notebook, with the same hyperparameters.
+    """
+    return {
+        'LinearRegression': LinearRegression(),
+        'Ridge': Ridge(random_state = 42, alpha = 0.5, solver = 'cholesky', tol = 0.0001),
+        'Lasso': Lasso(random_state = 42, alpha = 0.1, max_iter = 10000),
+        'RandomForest': RandomForestRegressor(n_estimators = 100, random_state = 42),
+        'DecisionTree': DecisionTreeRegressor(random_state = 42, max_depth = 5),
+        'ExtraTrees': ExtraTreesRegressor(n_estimators = 100, random_state = 42),
+        'final_model': Lasso(random_state = 42, alpha = 0.5, max_iter = 1000, tol = 0.0001),
+    }
+
+
+def share_folds(X, y, folder, n_splits: int = 5, shuffle: bool = False, random_state: int | None = None) -> Path:
+    """
+    Write X, y and the fold of every row to folder as .npy files, which the
+    jobs memory-map instead of receiving pickled copies of the data.
+    """
+    folder = Path(folder)
+    folder.mkdir(parents = True, exist_ok = True)
+    X = np.asarray(X, dtype = np.float64)
+    fold = np.empty(len(X), dtype = np.int16)
+    kfold = KFold(n_splits = n_splits, shuffle = shuffle, random_state = random_state)
+    for k, (_, test) in enumerate(kfold.split(X)):
+        fold[test] = k
+    np.save(folder / 'X.npy', X)
+    np.save(folder / 'y.npy', np.asarray(y, dtype = np.float64))
+    np.save(folder / 'fold.npy', fold)
+    return folder
+
+
+def load_folds(folder) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    folder = Path(folder)
+    return tuple(np.load(folder / f'{n}.npy', mmap_mode = 'r') for n in ('X', 'y', 'fold'))
+
+
+def fit_fold(name: str, estimator, folder, k: int) -> dict:
+    """
+    Fit estimator on every fold but k of the shared data and score it on fold k.
+    """
+    X, y, fold = load_folds(folder)
+    train = fold != k
+    tracemalloc.start()
+    start = time.perf_counter()
+    estimator.fit(X[train], y[train])
+    fit_time = time.perf_counter() - start
+    start = time.perf_counter()
+    pred = estimator.predict(X[~train])
+    predict_time = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'model': name,
+        'fold': k,
+        'rmse': float(np.sqrt(np.mean((y[~train] - pred) ** 2))),
+        'fit_time_s': fit_time,
+        'predict_time_s': predict_time,
+        'peak_memory_mb': peak / 2**20,
+    }
+
+
+def cross_validate_models(
+    X,
+    y,
+    candidates: dict | None = None,
+    n_splits: int = 5,
+    n_jobs: int | None = None,
+    folder = None,
+    ) -> pd.DataFrame:
+    """
+    Run every candidate x fold combination concurrently on a process pool
+    and return one row of metrics per combination.
+    """
+    candidates = default_candidates() if candidates is None else candidates
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = share_folds(X, y, tmp if folder is None else folder, n_splits = n_splits)
+        with ProcessPoolExecutor(n_jobs) as pool:
+            futures = [
+                pool.submit(fit_fold, name, estimator, folder, k)
+                for name, estimator in candidates.items()
+                for k in range(n_splits)
+            ]
+            return pd.DataFrame([f.result() for f in futures])
+
+
+def comparison_table(results: pd.DataFrame) -> pd.DataFrame:
+    """
+    Summarize per-fold results into one row per model, sorted by mean RMSE.
+    """
+    table = results.groupby('model').agg(
+        rmse = ('rmse', 'mean'),
+        rmse_std = ('rmse', 'std'),
+        fit_time_s = ('fit_time_s', 'mean'),
+        predict_time_s = ('predict_time_s', 'mean'),
+        peak_memory_mb = ('peak_memory_mb', 'max'),
+    )
+    return table.sort_values('rmse')
+
+
+def compare_models(X, y, out_path = None, **kwargs) -> pd.DataFrame:
+    """
+    Cross-validate the candidates and write the comparison table to out_path
+    as csv when given.
+    """
+    table = comparison_table(cross_validate_models(X, y, **kwargs))
+    if out_path is not None:
+        table.to_csv(out_path)
+    return table
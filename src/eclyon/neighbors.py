@@ -0,0 +1,160 @@
+"""
+Nearest historical sessions of a setup, over the standardized numeric columns.
+
+    index = SessionIndex.build(pd.read_csv('DS.csv'))
+    index.save('sessions.index')
+    index = SessionIndex.load('sessions.index')
+    index.query(setups, k = 5)      # query, rank, row, distance, Lap_Time_s
+    index.add(new_sessions)         # appended, searchable right away
+
+Sessions are indexed in a KD-tree saved with the standardized data.
+Appended sessions go to a delta buffer scanned exactly at query time; the
+tree is rebuilt over everything once the buffer grows past rebuild_fraction
+of the indexed rows. Rows are numbered in order of insertion, so that row is
+the position of the session in the concatenation of the data added.
+"""
+import json
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+
+class SessionIndex:
+
+    def __init__(
+        self,
+        columns: list[str],
+        mean: np.ndarray,
+        std: np.ndarray,
+        y_field: str = 'Lap_Time_s',
+        leaf_size: int = 40,
+        rebuild_fraction: float = 0.1,
+        ):
+        self.columns = list(columns)
+        self.mean = np.asarray(mean, dtype = np.float64)
+        self.std = np.asarray(std, dtype = np.float64)
+        self.y_field = y_field
+        self.leaf_size = leaf_size
+        self.rebuild_fraction = rebuild_fraction
+        self.X = np.empty((0, len(self.columns)))
+        self.y = np.empty(0)
+        self.delta_X = np.empty((0, len(self.columns)))
+        self.delta_y = np.empty(0)
+        self.tree = None
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, y_field: str = 'Lap_Time_s', columns: list[str] | None = None, **kwargs) -> 'SessionIndex':
+        """
+        Index the sessions of df on columns (by default its numeric columns
+        but y_field), standardized with their mean and std in df.
+        """
+        if columns is None:
+            columns = [n for n in df.select_dtypes(include = [np.number]).columns if n != y_field]
+        X = df[columns].to_numpy(dtype = np.float64)
+        std = X.std(axis = 0)
+        index = cls(columns, X.mean(axis = 0), np.where(std > 0, std, 1.0), y_field, **kwargs)
+        index.X = index.standardize(X)
+        index.y = df[y_field].to_numpy(dtype = np.float64)
+        index.rebuild()
+        return index
+
+    @property
+    def n_rows(self) -> int:
+        return len(self.X) + len(self.delta_X)
+
+    def standardize(self, X) -> np.ndarray:
+        if hasattr(X, 'columns'):
+            X = X[self.columns]
+        return (np.atleast_2d(np.asarray(X, dtype = np.float64)) - self.mean) / self.std
+
+    def rebuild(self) -> None:
+        """
+        Merge the delta buffer into the indexed rows and rebuild the tree.
+        """
+        from sklearn.neighbors import KDTree
+        self.X = np.vstack([self.X, self.delta_X])
+        self.y = np.concatenate([self.y, self.delta_y])
+        self.delta_X = np.empty((0, len(self.columns)))
+        self.delta_y = np.empty(0)
+        self.tree = KDTree(self.X, leaf_size = self.leaf_size)
+
+    def add(self, df: pd.DataFrame) -> None:
+        """
+        Append the sessions of df, standardized with the statistics of the
+        build data so that distances stay comparable.
+        """
+        self.delta_X = np.vstack([self.delta_X, self.standardize(df)])
+        self.delta_y = np.concatenate([self.delta_y, df[self.y_field].to_numpy(dtype = np.float64)])
+        if len(self.delta_X) > self.rebuild_fraction * len(self.X):
+            self.rebuild()
+
+    def kneighbors(self, X, k: int = 5) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Distances and rows of the k nearest sessions of every row of X, as
+        (n_queries, k) arrays sorted by distance.
+        """
+        Q = self.standardize(X)
+        k = min(k, self.n_rows)
+        dist, rows = self.tree.query(Q, k = min(k, len(self.X)))
+        if len(self.delta_X):
+            # |q - d|^2 = |q|^2 + |d|^2 - 2 q.d, without a (n_queries, n_delta, n_columns) temporary
+            sq = (Q ** 2).sum(axis = 1)[:, None] + (self.delta_X ** 2).sum(axis = 1) - 2 * Q @ self.delta_X.T
+            delta = np.sqrt(np.maximum(sq, 0))
+            dist = np.hstack([dist, delta])
+            rows = np.hstack([rows, np.broadcast_to(np.arange(len(self.delta_X)) + len(self.X), delta.shape)])
+            order = np.argsort(dist, axis = 1, kind = 'stable')[:, :k]
+            dist = np.take_along_axis(dist, order, axis = 1)
+            rows = np.take_along_axis(rows, order, axis = 1)
+        return dist, rows
+
+    def targets(self, rows: np.ndarray) -> np.ndarray:
+        return np.concatenate([self.y, self.delta_y])[rows]
+
+    def query(self, X, k: int = 5) -> pd.DataFrame:
+        """
+        The k nearest sessions of every row of X, in long format.
+        """
+        dist, rows = self.kneighbors(X, k)
+        n_queries, k = rows.shape
+        return pd.DataFrame({
+            'query': np.repeat(np.arange(n_queries), k),
+            'rank': np.tile(np.arange(k), n_queries),
+            'row': rows.ravel(),
+            'distance': dist.ravel(),
+            self.y_field: self.targets(rows).ravel(),
+        })
+
+    def estimate(self, X, k: int = 5) -> np.ndarray:
+        """
+        Inverse distance weighted mean of the target of the k nearest sessions.
+        """
+        dist, rows = self.kneighbors(X, k)
+        weights = 1 / np.maximum(dist, 1e-9)
+        return (weights * self.targets(rows)).sum(axis = 1) / weights.sum(axis = 1)
+
+    def save(self, path) -> None:
+        """
+        Store the index in directory path: the standardized rows, the delta
+        buffer and the pickled tree.
+        """
+        import joblib
+        path = Path(path)
+        path.mkdir(parents = True, exist_ok = True)
+        for n in ('X', 'y', 'delta_X', 'delta_y'):
+            np.save(path / f'{n}.npy', getattr(self, n))
+        joblib.dump(self.tree, path / 'tree.pkl')
+        meta = {
+            'columns': self.columns, 'mean': self.mean.tolist(), 'std': self.std.tolist(), 'y_field': self.y_field,
+            'leaf_size': self.leaf_size, 'rebuild_fraction': self.rebuild_fraction,
+        }
+        (path / 'meta.json').write_text(json.dumps(meta))
+
+    @classmethod
+    def load(cls, path) -> 'SessionIndex':
+        import joblib
+        path = Path(path)
+        index = cls(**json.loads((path / 'meta.json').read_text()))
+        for n in ('X', 'y', 'delta_X', 'delta_y'):
+            setattr(index, n, np.load(path / f'{n}.npy'))
+        index.tree = joblib.load(path / 'tree.pkl')
+        return index
@@ -0,0 +1,154 @@
+"""
+Partial dependence and ICE curves of a model on one or two features.
+
+    pd_df = partial_dependence(predictor, X, ['Front_Tire_Pressure_bar'])
+    pd_df = partial_dependence(predictor, X, ['Car_Weight_kg', 'Engine_Power_hp'], n_points = 15)
+
+The brute method copies the background rows once per grid point into a
+single preallocated array and scores it with one predict call. For forests,
+method = 'recursion' walks the flattened trees instead, weighting the
+branches of the other features by their training samples, which is exact
+and does not need background rows.
+"""
+import numpy as np
+import pandas as pd
+
+from eclyon.forest import FlatForest
+from eclyon.predict import Predictor
+
+
+def feature_grid(x: np.ndarray, n_points: int = 20, percentiles: tuple[float, float] = (0.05, 0.95)) -> np.ndarray:
+    """
+    The distinct values of x if there are at most n_points of them (e.g. an
+    encoded category), otherwise n_points evenly spaced between the percentiles.
+    """
+    x = np.asarray(x, dtype = np.float64)
+    x = x[~np.isnan(x)]
+    values = np.unique(x)
+    if len(values) <= n_points:
+        return values
+    lo, hi = np.quantile(x, percentiles)
+    return np.linspace(lo, hi, n_points)
+
+
+def make_grid(grids: list[np.ndarray]) -> np.ndarray:
+    """
+    Cartesian product of one or two 1D grids, as a (n_points, n_features) array.
+    """
+    mesh = np.meshgrid(*grids, indexing = 'ij')
+    return np.column_stack([m.ravel() for m in mesh])
+
+
+def expand_grid(X: np.ndarray, columns: list[int], grid: np.ndarray) -> np.ndarray:
+    """
+    The rows of X repeated for every point of grid, with columns set to the
+    point, as a (n_points * n_rows, n_features) array filled in place.
+    """
+    n_rows, n_features = X.shape
+    out = np.empty((len(grid), n_rows, n_features), dtype = np.float64)
+    out[:] = X
+    for k, j in enumerate(columns):
+        out[:, :, j] = grid[:, k, None]
+    return out.reshape(-1, n_features)
+
+
+def _background(X: np.ndarray, n_background: int | None, seed: int) -> np.ndarray:
+    if n_background is None or len(X) <= n_background:
+        return X
+    rows = np.random.default_rng(seed).choice(len(X), n_background, replace = False)
+    return X[np.sort(rows)]
+
+
+def ice(
+    predictor: Predictor,
+    X,
+    features: list[str],
+    grid: np.ndarray | None = None,
+    n_points: int = 20,
+    n_background: int | None = 500,
+    seed: int = 0,
+    ) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Individual conditional expectation curves of at most n_background rows
+    of X. Returns the (n_points, n_features) grid and the (n_rows, n_points)
+    predictions.
+    """
+    X = predictor.as_array(X)
+    columns = [predictor.feature_names.index(f) for f in features]
+    if grid is None:
+        grid = make_grid([feature_grid(X[:, j], n_points) for j in columns])
+    X = _background(X, n_background, seed)
+    y = predictor.predict(expand_grid(X, columns, grid))
+    return grid, y.reshape(len(grid), len(X)).T
+
+
+def forest_partial_dependence(forest: FlatForest, columns: list[int], grid: np.ndarray) -> np.ndarray:
+    """
+    Exact partial dependence of a forest at every point of grid. All the
+    (grid point, node, weight) triples of all trees are pushed down one
+    level at a time: a split on one of columns sends the weight to the
+    branch of the point, any other split divides it between both children
+    in proportion of their training samples.
+    """
+    grid = np.asarray(grid, dtype = np.float32)
+    target = np.full(forest.n_features, -1)
+    target[columns] = np.arange(len(columns))
+    point = np.repeat(np.arange(len(grid)), forest.n_trees)
+    node = np.tile(np.asarray(forest.roots), len(grid))
+    weight = np.ones(len(node))
+    res = np.zeros(len(grid))
+    while len(node):
+        feature = forest.feature[node]
+        leaf = feature < 0
+        np.add.at(res, point[leaf], weight[leaf] * forest.value[node[leaf]])
+        point, node, weight, feature = point[~leaf], node[~leaf], weight[~leaf], feature[~leaf]
+
+        k = target[feature]
+        fixed = k >= 0
+        go_left = grid[point[fixed], k[fixed]] <= forest.threshold[node[fixed]]
+        fixed_node = np.where(go_left, forest.left[node[fixed]], forest.right[node[fixed]])
+
+        free = node[~fixed]
+        left, right = forest.left[free], forest.right[free]
+        n = forest.n_node_samples[free]
+        point = np.concatenate([point[fixed], point[~fixed], point[~fixed]])
+        weight = np.concatenate([
+            weight[fixed],
+            weight[~fixed] * forest.n_node_samples[left] / n,
+            weight[~fixed] * forest.n_node_samples[right] / n,
+        ])
+        node = np.concatenate([fixed_node, left, right])
+    return res / forest.n_trees
+
+
+def partial_dependence(
+    predictor: Predictor,
+    X,
+    features: list[str],
+    n_points: int = 20,
+    n_background: int | None = 500,
+    method: str = 'brute',
+    seed: int = 0,
+    ) -> pd.DataFrame:
+    """
+    Partial dependence of the model on one or two features, one row per grid
+    point. With the brute method, std is the spread of the ICE curves at the
+    point; the recursion method (tree models only, ValueError otherwise) is
+    exact over the training distribution stored in the trees and only uses X
+    to build the grid.
+    """
+    if len(features) not in (1, 2):
+        raise ValueError(f'Expected 1 or 2 features, got {len(features)}')
+    X = predictor.as_array(X)
+    columns = [predictor.feature_names.index(f) for f in features]
+    grid = make_grid([feature_grid(X[:, j], n_points) for j in columns])
+    res = pd.DataFrame(grid, columns = features)
+    if method == 'recursion':
+        res['pd'] = forest_partial_dependence(predictor.flat_forest(), columns, grid)
+    elif method == 'brute':
+        _, curves = ice(predictor, X, features, grid, n_background = n_background, seed = seed)
+        res['pd'] = curves.mean(axis = 0)
+        res['std'] = curves.std(axis = 0)
+    else:
+        raise ValueError(f'Unknown method: {method}')
+    return res
@@ -0,0 +1,135 @@
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import json
+import numpy as np
+import pandas as pd
+
+from eclyon.cache import fingerprint
+from eclyon.predict import Predictor
+
+
+_worker = {}
+
+
+def _rmse(y: np.ndarray, pred: np.ndarray) -> float:
+    return float(np.sqrt(np.mean((y - pred) ** 2)))
+
+
+def _init_worker(predictor: Predictor, X: np.ndarray, y: np.ndarray) -> None:
+    # One private buffer per worker, permuted and restored column by column
+    _worker.update(predictor = predictor, X = np.array(X), y = y)
+
+
+def _permuted_score(j: int, seed: int, repeat: int) -> float:
+    """
+    Score of the model once column j of the worker buffer has been shuffled.
+    The permutation only depends on (seed, j, repeat).
+    """
+    X, y = _worker['X'], _worker['y']
+    col = X[:, j].copy()
+    X[:, j] = col[np.random.default_rng([seed, j, repeat]).permutation(len(col))]
+    try:
+        return _rmse(y, _worker['predictor'].predict(X))
+    finally:
+        X[:, j] = col
+
+
+def _separated(scores: dict, z: float, top_k: int | None = None) -> set:
+    """
+    Features whose rank is settled: once features are sorted by mean score,
+    their confidence interval is clear of those of their rank neighbours, or
+    with top_k, of the cutoff between the k-th and (k+1)-th features. Features
+    whose scores are all equal (e.g. unused by the model, whose permutation
+    never changes the score) are settled too.
+    """
+    bounds = {}
+    for j, s in scores.items():
+        s = np.array(list(s.values()))
+        half = z * s.std(ddof = 1) / np.sqrt(len(s)) if len(s) > 1 else np.inf
+        bounds[j] = (s.mean() - half, s.mean() + half)
+    order = sorted(bounds, key = lambda j: -sum(bounds[j]))
+    settled = set()
+    for i, j in enumerate(order):
+        lo, hi = bounds[j]
+        above = i == 0 or hi < bounds[order[i - 1]][0]
+        below = i == len(order) - 1 or bounds[order[i + 1]][1] < lo
+        if (above and below) or lo == hi:
+            settled.add(j)
+        elif top_k is not None and 0 < top_k < len(order):
+            if i < top_k and bounds[order[top_k]][1] < lo:
+                settled.add(j)
+            elif i >= top_k and hi < bounds[order[top_k - 1]][0]:
+                settled.add(j)
+    return settled
+
+
+def permutation_importance(
+    model,
+    X: pd.DataFrame | np.ndarray,
+    y: np.ndarray,
+    n_repeats: int = 5,
+    seed: int = 0,
+    n_jobs: int | None = None,
+    cache_dir = None,
+    early_stop: bool = False,
+    z: float = 1.96,
+    top_k: int | None = None,
+    ) -> pd.DataFrame:
+    """
+    Increase of the RMSE of model when each column of X is shuffled, averaged
+    over n_repeats seeded permutations. Repeats are run round by round, the
+    features of a round being spread over a process pool. With early_stop,
+    a feature stops being repeated once its confidence interval is clear of
+    those of the features ranked just above and below it, or with top_k (when
+    only the top features matter), of the cutoff below the top_k ones. With
+    cache_dir, every score is stored on disk under a fingerprint of (model, X,
+    y, seed), so reruns only compute what is missing.
+    """
+    predictor = model if isinstance(model, Predictor) else Predictor(model)
+    # as_array puts the columns of X in the order of the model features
+    columns = predictor.feature_names
+    X = predictor.as_array(X)
+    y = np.asarray(y, dtype = np.float64)
+
+    cache_file, scores = None, {}
+    if cache_dir is not None:
+        cache_file = Path(cache_dir) / f'permutation_{fingerprint(predictor.model, X, y, seed)}.json'
+        if cache_file.exists():
+            scores = {int(j): {int(r): v for r, v in s.items()} for j, s in json.loads(cache_file.read_text()).items()}
+    for j in range(X.shape[1]):
+        scores.setdefault(j, {})
+
+    baseline = _rmse(y, predictor.predict(X))
+    active = set(scores)
+    pool = None if n_jobs == 1 else ProcessPoolExecutor(n_jobs, initializer = _init_worker, initargs = (predictor, X, y))
+    if pool is None:
+        _init_worker(predictor, X, y)
+    try:
+        for r in range(n_repeats):
+            todo = [j for j in sorted(active) if r not in scores[j]]
+            if pool is None:
+                results = [_permuted_score(j, seed, r) for j in todo]
+            else:
+                results = list(pool.map(_permuted_score, todo, [seed] * len(todo), [r] * len(todo)))
+            for j, s in zip(todo, results):
+                scores[j][r] = s
+            if cache_file is not None and todo:
+                cache_file.parent.mkdir(parents = True, exist_ok = True)
+                cache_file.write_text(json.dumps(scores))
+            if early_stop and r >= 1:
+                active -= _separated({j: {k: v for k, v in s.items() if k <= r} for j, s in scores.items()}, z, top_k)
+                if not active:
+                    break
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        _worker.clear()
+
+    imps = [np.array([v for k, v in scores[j].items() if k < n_repeats]) - baseline for j in range(X.shape[1])]
+    res = pd.DataFrame({
+        'cols': columns,
+        'imp': [s.mean() for s in imps],
+        'std': [s.std() for s in imps],
+        'n_repeats': [len(s) for s in imps],
+    })
+    return res.sort_values('imp', ascending = False)
@@ -1,12 +1,22 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING
 import re
-import IPython
-import graphviz
-from sklearn.base import ClassifierMixin
-from sklearn.tree import export_graphviz
-import matplotlib.pyplot as plt
+import weakref
+import numpy as np
+import pandas as pd
+
+from eclyon.forest import FlatForest
+
+
+# IPython, graphviz, matplotlib and sklearn take seconds to import, they
+# are only loaded by the functions that draw
+if TYPE_CHECKING:
+    from sklearn.base import ClassifierMixin
 
 
 def set_plot_sizes(sml: int, med: int, big: int) -> None:
+    import matplotlib.pyplot as plt
     plt.rc('font', size = sml)          # controls default text sizes
     plt.rc('axes', titlesize = sml)     # fontsize of the axes title
     plt.rc('axes', labelsize = med)     # fontsize of the x and y labels
@@ -18,7 +28,7 @@ def set_plot_sizes(sml: int, med: int, big: int) -> None:
 
     
 def draw_tree(
-    tree: ClassifierMixin, 
+    tree: 'ClassifierMixin', 
     feature_names: list[str], 
     size: int = 10, 
     ratio: float = 0.6, 
@@ -27,6 +37,9 @@ def draw_tree(
     """
     Draws a representation of a random forest in IPython.
     """
+    import IPython
+    import graphviz
+    from sklearn.tree import export_graphviz
     s = export_graphviz(
         tree, 
         out_file = None, 
@@ -39,3 +52,122 @@ def draw_tree(
     IPython.display.display(
         graphviz.Source(re.sub('Tree {', f'Tree {{ size={size}; ratio={ratio}', s))
     )
+
+
+def _fill_color(value: float, lo: float, hi: float) -> str:
+    alpha = int(255 * (value - lo) / (hi - lo)) if hi > lo else 0
+    return f'#e58139{alpha:02x}'
+
+
+# DOT sources of every forest, dropped with the forest
+_dot_cache = weakref.WeakKeyDictionary()
+
+
+def tree_to_dot(forest: FlatForest, tree: int, max_depth: int | None = None, precision: int = 2) -> str:
+    """
+    DOT source of one tree of a FlatForest, written straight from the flat
+    arrays. Below max_depth, subtrees are collapsed into a single '...' node.
+    Results are cached per (forest, tree, max_depth, precision, feature names).
+    """
+    names = forest.feature_names or [f'X[{i}]' for i in range(forest.n_features)]
+    cache = _dot_cache.setdefault(forest, {})
+    key = (tree, max_depth, precision, tuple(names))
+    if key not in cache:
+        cache[key] = _tree_to_dot(forest, tree, max_depth, precision, names)
+    return cache[key]
+
+
+def _tree_to_dot(forest: FlatForest, tree: int, max_depth: int | None, precision: int, names: list[str]) -> str:
+    nodes = forest.tree_nodes(tree)
+    values = forest.value[nodes]
+    lo, hi = values.min(), values.max()
+    root = int(forest.roots[tree])
+    lines = [
+        'digraph Tree {',
+        'node [shape=box, style="filled, rounded", color="black", fontname="helvetica"] ;',
+        'edge [fontname="helvetica"] ;',
+        'rankdir=LR ;',
+    ]
+    stack = [(root, 0)]
+    while stack:
+        node, depth = stack.pop()
+        i = node - root
+        label = f'samples = {forest.n_node_samples[node]:.0f}\\nvalue = {forest.value[node]:.{precision}f}'
+        if forest.feature[node] >= 0:
+            label = f'{names[forest.feature[node]]} <= {forest.threshold[node]:.{precision}f}\\n' + label
+        lines.append(f'{i} [label="{label}", fillcolor="{_fill_color(forest.value[node], lo, hi)}"] ;')
+        if forest.feature[node] < 0:
+            continue
+        for child in (forest.right[node], forest.left[node]):
+            j = int(child) - root
+            if max_depth is not None and depth + 1 > max_depth:
+                lines.append(f'{j} [label="...", fillcolor="#ffffff"] ;')
+            else:
+                stack.append((int(child), depth + 1))
+            lines.append(f'{i} -> {j} ;')
+    lines.append('}')
+    return '\n'.join(lines)
+
+
+def draw_flat_tree(forest: FlatForest, tree: int = 0, max_depth: int | None = 3, size: int = 10, ratio: float = 0.6):
+    """
+    Draws a depth limited view of one tree of a FlatForest in IPython.
+    """
+    import IPython
+    import graphviz
+    s = tree_to_dot(forest, tree, max_depth)
+    IPython.display.display(
+        graphviz.Source(re.sub('Tree {', f'Tree {{ size={size}; ratio={ratio}', s))
+    )
+
+
+def split_statistics(forest: FlatForest) -> pd.DataFrame:
+    """
+    Aggregate the splits of every tree of the forest by feature and depth:
+    number of splits, samples going through them, and threshold statistics.
+    """
+    split = np.flatnonzero(forest.feature >= 0)
+    names = forest.feature_names or [f'X[{i}]' for i in range(forest.n_features)]
+    splits = pd.DataFrame({
+        'feature': np.asarray(names, dtype = object)[forest.feature[split]],
+        'depth': forest.depths()[split],
+        'threshold': forest.threshold[split],
+        'samples': forest.n_node_samples[split],
+    })
+    return splits.groupby(['feature', 'depth']).agg(
+        n_splits = ('threshold', 'size'),
+        samples = ('samples', 'sum'),
+        threshold_mean = ('threshold', 'mean'),
+        threshold_min = ('threshold', 'min'),
+        threshold_max = ('threshold', 'max'),
+    ).reset_index()
+
+
+def render_trees(
+    forest: FlatForest,
+    out_dir,
+    trees: list[int] | None = None,
+    max_depth: int | None = None,
+    fmt: str = 'svg',
+    n_jobs: int | None = None,
+    ) -> list[Path]:
+    """
+    Render trees of the forest to out_dir/tree_{i}.{fmt} with graphviz, in a
+    pool of workers (each render runs the dot executable). fmt = 'dot' only
+    writes the DOT sources.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents = True, exist_ok = True)
+    trees = range(forest.n_trees) if trees is None else trees
+
+    def render(t: int) -> Path:
+        dot = tree_to_dot(forest, t, max_depth)
+        if fmt == 'dot':
+            path = out_dir / f'tree_{t}.dot'
+            path.write_text(dot)
+            return path
+        import graphviz
+        return Path(graphviz.Source(dot).render(out_dir / f'tree_{t}', format = fmt, cleanup = True))
+
+    with ThreadPoolExecutor(n_jobs) as pool:
+        return list(pool.map(render, trees))
@@ -0,0 +1,120 @@
+from functools import lru_cache
+from pathlib import Path
+from typing import Mapping
+import numpy as np
+
+from eclyon.forest import FlatForest
+
+
+def _read_table(path: Path, columns: list[str]) -> np.ndarray:
+    """
+    Read the given columns of a parquet, arrow/feather or npy file into a
+    (n_rows, n_columns) float64 array.
+    """
+    suffix = path.suffix.lower()
+    if suffix == '.npy':
+        return np.load(path, mmap_mode = 'r')
+    if suffix == '.parquet':
+        import pyarrow.parquet as pq
+        table = pq.read_table(path, columns = columns)
+    elif suffix in ('.arrow', '.feather', '.ipc'):
+        import pyarrow.feather as feather
+        table = feather.read_table(path, columns = columns)
+    else:
+        raise ValueError(f'Unsupported file format: {path.suffix}')
+    X = np.empty((table.num_rows, len(columns)), dtype = np.float64)
+    for j, n in enumerate(columns):
+        X[:, j] = table.column(n).to_numpy()
+    return X
+
+
+class Predictor:
+    """
+    Batch scoring around a fitted regressor. The feature order is fixed once,
+    every input (array, DataFrame, mapping or file) is laid out as a float64
+    array in that order, and linear models are scored with a single
+    matrix-vector product instead of going through the estimator.
+    """
+
+    def __init__(self, model, feature_names: list[str] | None = None):
+        self.model = model
+        if feature_names is None:
+            feature_names = model.feature_names_in_
+        self.feature_names = list(feature_names)
+        coef = getattr(model, 'coef_', None)
+        if coef is not None and np.ndim(coef) == 1:
+            self.coef = np.ascontiguousarray(coef, dtype = np.float64)
+            self.intercept = float(model.intercept_)
+        else:
+            self.coef = self.intercept = None
+        self.forest = None
+
+    @classmethod
+    def load(cls, path) -> 'Predictor':
+        import joblib
+        return cls(joblib.load(path))
+
+    @property
+    def is_linear(self) -> bool:
+        return self.coef is not None
+
+    def as_array(self, X) -> np.ndarray:
+        """
+        Lay X out as a (n_rows, n_features) float64 array in feature order.
+        """
+        if isinstance(X, (str, Path)):
+            return _read_table(Path(X), self.feature_names)
+        if isinstance(X, Mapping):
+            return np.array([[X[n] for n in self.feature_names]], dtype = np.float64)
+        if hasattr(X, 'columns'):
+            return X[self.feature_names].to_numpy(dtype = np.float64)
+        X = np.atleast_2d(np.asarray(X, dtype = np.float64))
+        if X.shape[1] != len(self.feature_names):
+            raise ValueError(f'Expected {len(self.feature_names)} features, got {X.shape[1]}')
+        return X
+
+    def predict(self, X) -> np.ndarray:
+        X = self.as_array(X)
+        if self.is_linear:
+            return X @ self.coef + self.intercept
+        import pandas as pd
+        return self.model.predict(pd.DataFrame(X, columns = self.feature_names, copy = False))
+
+    def predict_dist(self, X, quantiles: tuple[float, ...] = (0.05, 0.5, 0.95)) -> dict[str, np.ndarray]:
+        """
+        Mean, variance and quantiles of the tree predictions, for forests.
+        The model is flattened on first use.
+        """
+        if not hasattr(self.model, 'estimators_'):
+            raise ValueError(f'{type(self.model).__name__} has no trees to draw intervals from')
+        return self.flat_forest().predict_dist(self.as_array(X), quantiles)
+
+    def flat_forest(self) -> FlatForest:
+        """
+        The trees of the model (a forest or a single tree) flattened, on
+        first use only.
+        """
+        if self.forest is None:
+            if not (hasattr(self.model, 'estimators_') or hasattr(self.model, 'tree_')):
+                raise ValueError(f'{type(self.model).__name__} is not a tree model')
+            self.forest = FlatForest.from_sklearn(self.model)
+        return self.forest
+
+    def predict_rows(self, X) -> np.ndarray:
+        """
+        Reference path scoring one row at a time, as the demo app does.
+        """
+        import pandas as pd
+        X = self.as_array(X)
+        return np.array([
+            self.model.predict(pd.DataFrame(X[i:i + 1], columns = self.feature_names))[0]
+            for i in range(len(X))
+        ])
+
+
+@lru_cache(maxsize = None)
+def load_predictor(path) -> Predictor:
+    """
+    Load the model stored at path once per process.
+    """
+    return Predictor.load(path)
@@ -0,0 +1,198 @@
+"""
+Reference setups of the demo app: the base input row, whose columns are
+those of DS.csv without Lap_Time_s, and the car and track presets that
+overwrite parts of it. Categorical columns hold their level names, to be
+encoded with the CategoryEncoder saved next to the model.
+"""
+
+
+BASE_SETUP = {
+    'Car_Weight_kg': 0,
+    'Engine_Power_hp': 0,
+    'Max_Torque_Nm': 0,
+    'Top_Speed_kmh': 0,
+    'Acceleration_0_100_kmh': 0,
+    'Weight_Distribution_percentage': 0,
+    'Transmission_Type': 'automatic',
+    'Gear_Count': 0,
+    'Front_Tire_Pressure_bar': 0,
+    'Rear_Tire_Pressure_bar': 0,
+    'Front_Tire_Diameter_cm': 0,
+    'Rear_Tire_Diameter_cm': 0,
+    'Front_Suspension': 'medium',
+    'Rear_Suspension': 'medium',
+    'Aerodynamics_Drag_Coefficient_Cd': 0,
+    'Frontal_Area_m2': 0,
+    'Fuel_Type': 'diesel',
+    'Fuel_Consumption_L_100km': 0,
+    'Front_Brake_Temperature_C': 0,
+    'Rear_Brake_Temperature_C': 0,
+    'Differential_Type': 'limited-slip',
+    'Front_Camber_Angle_deg': 0,
+    'Rear_Camber_Angle_deg': 0,
+    'Front_Brakes': 'discs',
+    'Rear_Brakes': 'discs',
+    'Track_Temperature_C': 0,
+    'Ambient_Temperature_C': 0,
+    'Humidity_percentage': 0,
+    'Wind_Speed_kmh': 0,
+    'Wind_Direction_deg': 0,
+    'Track_Condition': 'damp',
+    'Track_Altitude_m': 0,
+    'Track_Length_km': 0,
+    'Surface_Type': 'asphalt',
+    'Number_of_Corners': 0,
+    'Number_of_Straights': 0,
+    'Max_Gradient_percentage': 0,
+    'Number_of_Laps': 0,
+    'Driver_Reflexes_ms': 0,
+    'Driver_Experience': 'advanced',
+    'Driver_Fatigue': 0,
+    'Driver_Weight_kg': 0,
+    'Race_Strategy': 'aggressive',
+    'Overtakes': 0,
+    'Harsh_Braking_Count': 0,
+    'Driver_Mistakes': 0,
+    'Average_Lap_Speed_kmh': 0,
+    'Total_Race_Time_min': 0,
+    'Fastest_Lap_Time_s': 0,
+    'Slowest_Lap_Time_s': 0,
+    'Front_Tire_Degradation_percentage': 0,
+    'Rear_Tire_Degradation_percentage': 0,
+    'Tire_Changes_Count': 0,
+    'Gearbox_Condition': 'acceptable',
+    'Engine_Condition': 'acceptable',
+    'Technical_Problems': 'no',
+    'Trajectory_Changes': 0
+}
+
+CAR_PRESETS = {
+    "GT4": {
+        'Car_Weight_kg': 1350,
+        'Engine_Power_hp': 450,
+        'Max_Torque_Nm': 480,
+        'Top_Speed_kmh': 250,
+        'Acceleration_0_100_kmh': 4.0,
+        'Weight_Distribution_percentage': 50,
+        'Front_Tire_Diameter_cm': 18,
+        'Rear_Tire_Diameter_cm': 18,
+        'Aerodynamics_Drag_Coefficient_Cd': 0.32,
+        'Frontal_Area_m2': 2.0,
+        'Front_Tire_Pressure_bar': 1.8,
+        'Rear_Tire_Pressure_bar': 1.8,
+        'Front_Suspension': 'soft',
+        'Rear_Suspension': 'soft',
+        'Fuel_Consumption_L_100km': 12,
+    },
+    "GT3": {
+        'Car_Weight_kg': 1250,
+        'Engine_Power_hp': 550,
+        'Max_Torque_Nm': 520,
+        'Top_Speed_kmh': 280,
+        'Acceleration_0_100_kmh': 3.5,
+        'Weight_Distribution_percentage': 55,
+        'Front_Tire_Diameter_cm': 19,
+        'Rear_Tire_Diameter_cm': 19,
+        'Aerodynamics_Drag_Coefficient_Cd': 0.30,
+        'Frontal_Area_m2': 1.9,
+        'Front_Tire_Pressure_bar': 1.9,
+        'Rear_Tire_Pressure_bar': 1.9,
+        'Front_Suspension': 'medium',
+        'Rear_Suspension': 'medium',
+        'Fuel_Consumption_L_100km': 10,
+    },
+    "GT2": {
+        'Car_Weight_kg': 1200,
+        'Engine_Power_hp': 650,
+        'Max_Torque_Nm': 600,
+        'Top_Speed_kmh': 300,
+        'Acceleration_0_100_kmh': 3.2,
+        'Weight_Distribution_percentage': 56,
+        'Front_Tire_Diameter_cm': 20,
+        'Rear_Tire_Diameter_cm': 20,
+        'Aerodynamics_Drag_Coefficient_Cd': 0.28,
+        'Frontal_Area_m2': 1.8,
+        'Front_Tire_Pressure_bar': 2.0,
+        'Rear_Tire_Pressure_bar': 2.0,
+        'Front_Suspension': 'medium',
+        'Rear_Suspension': 'medium',
+        'Fuel_Consumption_L_100km': 9,
+    },
+    "Hypercar": {
+        'Car_Weight_kg': 1000,
+        'Engine_Power_hp': 1000,
+        'Max_Torque_Nm': 1000,
+        'Top_Speed_kmh': 350,
+        'Acceleration_0_100_kmh': 2.5,
+        'Weight_Distribution_percentage': 58,
+        'Front_Tire_Diameter_cm': 21,
+        'Rear_Tire_Diameter_cm': 21,
+        'Aerodynamics_Drag_Coefficient_Cd': 0.25,
+        'Frontal_Area_m2': 1.7,
+        'Front_Tire_Pressure_bar': 2.2,
+        'Rear_Tire_Pressure_bar': 2.2,
+        'Front_Suspension': 'stiff',
+        'Rear_Suspension': 'stiff',
+        'Fuel_Consumption_L_100km': 5,
+    }
+}
+
+
+TRACK_PRESETS = {
+    "Monza": {
+        'Track_Temperature_C': 30,
+        'Ambient_Temperature_C': 25,
+        'Humidity_percentage': 40,
+        'Wind_Speed_kmh': 5,
+        'Wind_Direction_deg': 180,
+        'Track_Condition': 'dry',
+        'Track_Altitude_m': 160,
+        'Track_Length_km': 5.8,
+        'Surface_Type': 'asphalt',
+        'Max_Gradient_percentage': 3,
+        'Number_of_Corners': 11,
+        'Number_of_Straights': 4,
+    },
+    "LeMans": {
+        'Track_Temperature_C': 25,
+        'Ambient_Temperature_C': 20,
+        'Humidity_percentage': 60,
+        'Wind_Speed_kmh': 10,
+        'Wind_Direction_deg': 90,
+        'Track_Condition': 'dry',
+        'Track_Altitude_m': 50,
+        'Track_Length_km': 13.6,
+        'Surface_Type': 'asphalt',
+        'Max_Gradient_percentage': 2,
+        'Number_of_Corners': 33,
+        'Number_of_Straights': 3,
+    },
+    "Nurburgring": {
+        'Track_Temperature_C': 18,
+        'Ambient_Temperature_C': 15,
+        'Humidity_percentage': 75,
+        'Wind_Speed_kmh': 15,
+        'Wind_Direction_deg': 270,
+        'Track_Condition': 'dry',
+        'Track_Altitude_m': 620,
+        'Track_Length_km': 20.8,
+        'Surface_Type': 'asphalt',
+        'Max_Gradient_percentage': 10,
+        'Number_of_Corners': 154,
+        'Number_of_Straights': 5,
+    },
+    "Spa-Francorchamps": {
+        'Track_Temperature_C': 22,
+        'Ambient_Temperature_C': 20,
+        'Humidity_percentage': 50,
+        'Wind_Speed_kmh': 8,
+        'Wind_Direction_deg': 0,
+        'Track_Condition': 'dry',
+        'Track_Altitude_m': 470,
+        'Track_Length_km': 7.0,
+        'Surface_Type': 'asphalt',
+        'Max_Gradient_percentage': 6,
+        'Number_of_Corners': 20,
+        'Number_of_Straights': 3,
+    }
+}
@@ -0,0 +1,273 @@
+"""
+Asyncio HTTP scoring server in front of a pickled model.
+
+    python -m eclyon.server --model final_model.pkl --port 8000
+
+POST /predict with {"rows": [{column: value, ...}, ...]} (or lists of values
+in feature order) returns {"predictions": [...]}. For forests, POST
+/predict_dist with the same body returns the mean, variance and 5/50/95%
+quantiles across trees: {"mean": [...], "var": [...], "q5": [...], ...}.
+Requests arriving within max_delay of each other are scored together in one
+vectorized call.
+GET /metrics returns the latency and throughput counters, GET /health "ok".
+"""
+from collections import deque
+from pathlib import Path
+from typing import Mapping
+import argparse
+import asyncio
+import json
+import logging
+import time
+import urllib.request
+import numpy as np
+
+from eclyon.categories import CategoryEncoder, encoder_path
+from eclyon.predict import Predictor
+
+
+logger = logging.getLogger(__name__)
+
+
+class Metrics:
+    """
+    Request, row and batch counters, and the latencies of the last requests.
+    """
+
+    def __init__(self, window: int = 10_000):
+        self.started = time.perf_counter()
+        self.requests = self.rows = self.batches = self.errors = 0
+        self.latencies = deque(maxlen = window)
+
+    def report(self) -> dict:
+        uptime = time.perf_counter() - self.started
+        latencies = np.array(self.latencies) * 1e3
+        return {
+            'uptime_s': uptime,
+            'requests': self.requests,
+            'rows': self.rows,
+            'batches': self.batches,
+            'errors': self.errors,
+            'rows_per_batch': self.rows / self.batches if self.batches else 0.0,
+            'requests_per_s': self.requests / uptime,
+            'rows_per_s': self.rows / uptime,
+            'latency_p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else None,
+            'latency_p99_ms': float(np.percentile(latencies, 99)) if len(latencies) else None,
+        }
+
+
+class MicroBatcher:
+    """
+    Collect the rows of concurrent requests for at most max_delay seconds (or
+    max_batch rows) and score them with a single call of the method of
+    predictor, which returns an array or a dict of arrays.
+    """
+
+    def __init__(
+        self,
+        predictor: Predictor,
+        metrics: Metrics,
+        max_batch: int = 4096,
+        max_delay: float = 0.002,
+        method: str = 'predict',
+        ):
+        self.predictor = predictor
+        self.metrics = metrics
+        self.method = method
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.queue = asyncio.Queue()
+
+    async def submit(self, X: np.ndarray) -> np.ndarray:
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((X, future))
+        return await future
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self.queue.get()]
+            n_rows = len(pending[0][0])
+            deadline = loop.time() + self.max_delay
+            while n_rows < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(item)
+                n_rows += len(item[0])
+            try:
+                await self._score(pending, n_rows)
+            except Exception as e:
+                # A failed batch fails its own requests, never the batcher
+                logger.exception('Scoring a batch of %d rows failed', n_rows)
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+
+    async def _score(self, pending: list, n_rows: int) -> None:
+        """
+        Score one batch and hand every request its slice of the result. The
+        rows of requests cancelled while waiting are still scored, but their
+        futures are left alone.
+        """
+        X = np.vstack([X for X, _ in pending])
+        y = await asyncio.get_running_loop().run_in_executor(None, getattr(self.predictor, self.method), X)
+        self.metrics.batches += 1
+        self.metrics.rows += n_rows
+        start = 0
+        for X, future in pending:
+            if not future.done():
+                if isinstance(y, dict):
+                    future.set_result({k: v[start:start + len(X)] for k, v in y.items()})
+                else:
+                    future.set_result(y[start:start + len(X)])
+            start += len(X)
+
+
+class ScoringServer:
+
+    def __init__(
+        self,
+        predictor: Predictor,
+        encoder: CategoryEncoder | None = None,
+        max_batch: int = 4096,
+        max_delay: float = 0.002,
+        ):
+        self.predictor = predictor
+        self.encoder = encoder
+        self.metrics = Metrics()
+        self.batcher = MicroBatcher(predictor, self.metrics, max_batch, max_delay)
+        self.dist_batcher = MicroBatcher(predictor, self.metrics, max_batch, max_delay, method = 'predict_dist')
+
+    @classmethod
+    def for_model(cls, model_path, **kwargs) -> 'ScoringServer':
+        """
+        Server for the model pickled at model_path, with its category mappings if saved.
+        """
+        enc_path = encoder_path(model_path)
+        encoder = CategoryEncoder.load(enc_path) if enc_path.exists() else None
+        return cls(Predictor.load(model_path), encoder, **kwargs)
+
+    def parse_rows(self, rows: list) -> np.ndarray:
+        names = self.predictor.feature_names
+        if rows and isinstance(rows[0], dict):
+            if self.encoder is not None:
+                rows = [self.encoder.encode_row(row) for row in rows]
+            rows = [[row[n] for n in names] for row in rows]
+        return self.predictor.as_array(np.asarray(rows, dtype = np.float64))
+
+    async def handle_request(self, method: str, path: str, body: bytes) -> tuple[int, dict | str]:
+        if method == 'GET' and path == '/health':
+            return 200, 'ok'
+        if method == 'GET' and path == '/metrics':
+            return 200, self.metrics.report()
+        if method == 'POST' and path in ('/predict', '/predict_dist'):
+            start = time.perf_counter()
+            try:
+                X = self.parse_rows(json.loads(body)['rows'])
+                if path == '/predict':
+                    res = {'predictions': (await self.batcher.submit(X)).tolist()}
+                else:
+                    res = {k: v.tolist() for k, v in (await self.dist_batcher.submit(X)).items()}
+            except (ValueError, KeyError, TypeError) as e:
+                self.metrics.errors += 1
+                return 400, {'error': str(e)}
+            except Exception as e:
+                # Any other failure of the model or the cache, answered rather than dropping the connection
+                logger.exception('Failed to score %s request', path)
+                self.metrics.errors += 1
+                return 500, {'error': f'{type(e).__name__}: {e}'}
+            self.metrics.requests += 1
+            self.metrics.latencies.append(time.perf_counter() - start)
+            return 200, res
+        return 404, {'error': f'No route for {method} {path}'}
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                status, payload = await self.handle_request(method, path, body)
+                data = payload.encode() if isinstance(payload, str) else json.dumps(payload).encode()
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(
+                    f'HTTP/1.1 {status} {"OK" if status == 200 else "Error"}\r\n'
+                    f'Content-Type: {"text/plain" if isinstance(payload, str) else "application/json"}\r\n'
+                    f'Content-Length: {len(data)}\r\n'
+                    f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'.encode() + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 8000) -> None:
+        batchers = [asyncio.create_task(b.run()) for b in (self.batcher, self.dist_batcher)]
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for b in batchers:
+                b.cancel()
+
+
+class RemoteModel:
+    """
+    Client of a running ScoringServer, with the predict interface of Predictor.
+    """
+
+    def __init__(self, url: str, timeout: float = 10.0):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def _post(self, route: str, X) -> dict:
+        if isinstance(X, Mapping):
+            rows = [dict(X)]
+        elif hasattr(X, 'columns'):
+            rows = X.to_dict(orient = 'records')
+        else:
+            rows = np.asarray(X).tolist()
+        request = urllib.request.Request(
+            self.url + route,
+            data = json.dumps({'rows': rows}, default = lambda v: v.item()).encode(),
+            headers = {'Content-Type': 'application/json'},
+        )
+        with urllib.request.urlopen(request, timeout = self.timeout) as response:
+            return json.loads(response.read())
+
+    def predict(self, X) -> np.ndarray:
+        return np.array(self._post('/predict', X)['predictions'])
+
+    def predict_dist(self, X) -> dict[str, np.ndarray]:
+        return {k: np.array(v) for k, v in self._post('/predict_dist', X).items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Lap time scoring server')
+    parser.add_argument('--model', type = Path, default = Path('final_model.pkl'))
+    parser.add_argument('--host', default = '127.0.0.1')
+    parser.add_argument('--port', type = int, default = 8000)
+    parser.add_argument('--max-batch', type = int, default = 4096)
+    parser.add_argument('--max-delay-ms', type = float, default = 2.0)
+    args = parser.parse_args()
+    server = ScoringServer.for_model(args.model, max_batch = args.max_batch, max_delay = args.max_delay_ms / 1e3)
+    asyncio.run(server.serve(args.host, args.port))
+
+
+if __name__ == '__main__':
+    main()
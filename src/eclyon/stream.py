@@ -0,0 +1,152 @@
+from typing import Iterator
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_numeric_dtype
+
+from eclyon.transforms import Preprocessor
+
+
+class MedianSketch:
+    """
+    Mergeable approximate median of a numeric column seen in chunks. Each
+    value gets a uniform random key and only the size values with the
+    smallest keys are kept, which is a uniform sample of everything seen so
+    far. Two sketches merge by keeping the smallest keys of their union, so
+    chunks can be summarized independently (e.g. in different processes).
+    The median is exact as long as fewer than size values have been seen.
+    """
+
+    def __init__(self, size: int = 10_000, seed: int | None = None):
+        self.size = size
+        self.rng = np.random.default_rng(seed)
+        self.keys = np.empty(0)
+        self.values = np.empty(0)
+        self.n_seen = 0
+        self.n_missing = 0
+
+    def _keep_smallest(self, keys: np.ndarray, values: np.ndarray) -> None:
+        if len(keys) > self.size:
+            idx = np.argpartition(keys, self.size)[:self.size]
+            keys, values = keys[idx], values[idx]
+        self.keys, self.values = keys, values
+
+    def update(self, col: pd.Series | np.ndarray) -> 'MedianSketch':
+        values = np.asarray(col, dtype = np.float64)
+        missing = np.isnan(values)
+        values = values[~missing]
+        self.n_missing += int(missing.sum())
+        self.n_seen += len(values)
+        self._keep_smallest(
+            np.concatenate([self.keys, self.rng.random(len(values))]),
+            np.concatenate([self.values, values]),
+        )
+        return self
+
+    def merge(self, other: 'MedianSketch') -> 'MedianSketch':
+        self.n_missing += other.n_missing
+        self.n_seen += other.n_seen
+        self._keep_smallest(
+            np.concatenate([self.keys, other.keys]),
+            np.concatenate([self.values, other.values]),
+        )
+        return self
+
+    def median(self) -> float:
+        return float(np.median(self.values)) if len(self.values) else np.nan
+
+
+def read_csv_chunks(path, chunksize: int = 100_000, **read_csv_kwargs) -> Iterator[pd.DataFrame]:
+    """
+    Read a csv file as a sequence of frames of at most chunksize rows.
+    """
+    with pd.read_csv(path, chunksize = chunksize, **read_csv_kwargs) as reader:
+        yield from reader
+
+
+def fit_stream(
+    path,
+    y_field: str | None = None,
+    skip_flds: list | None = None,
+    ignore_flds: list | None = None,
+    na_dict: dict | None = None,
+    max_n_cat: int | None = None,
+    chunksize: int = 100_000,
+    sketch_size: int = 10_000,
+    seed: int | None = 0,
+    **read_csv_kwargs,
+    ) -> Preprocessor:
+    """
+    Fit a Preprocessor on a csv file too large to be loaded at once. Medians
+    are estimated with one MedianSketch per numeric column, category levels
+    are the union of the levels met in every chunk.
+    """
+    proc = Preprocessor(
+        y_field = y_field,
+        skip_flds = skip_flds,
+        ignore_flds = ignore_flds,
+        na_dict = na_dict,
+        max_n_cat = max_n_cat,
+    )
+    columns, sketches, levels, y_levels = None, {}, {}, set()
+    rng = np.random.default_rng(seed)
+    for chunk in read_csv_chunks(path, chunksize = chunksize, **read_csv_kwargs):
+        if columns is None:
+            columns = list(chunk.columns)
+            for n in proc._fit_columns(columns):
+                if is_numeric_dtype(chunk[n]):
+                    sketches[n] = MedianSketch(sketch_size, seed = rng.integers(2**32))
+                else:
+                    levels[n] = set()
+        for n, sketch in sketches.items():
+            if not is_numeric_dtype(chunk[n]):
+                raise ValueError(
+                    f'Column {n} is numeric in the first chunk but not in a later one, '
+                    'pass its dtype explicitly to read it consistently.'
+                )
+            sketch.update(chunk[n])
+        for n, seen in levels.items():
+            seen.update(chunk[n].dropna().unique())
+        if y_field is not None and not is_numeric_dtype(chunk[y_field]):
+            y_levels.update(chunk[y_field].dropna().unique())
+
+    na_dict, na_flags = dict(proc.na_dict), []
+    for n, sketch in sketches.items():
+        has_na = sketch.n_missing > 0
+        if has_na or (n in na_dict):
+            na_dict.setdefault(n, sketch.median())
+            if proc._flags_missing(n, has_na):
+                na_flags.append(n)
+    categories = {n: pd.Index(sorted(seen)) for n, seen in levels.items()}
+    y_categories = pd.Index(sorted(y_levels)) if y_levels else None
+    return proc._set_state(columns, na_dict, na_flags, categories, y_categories)
+
+
+def iter_batches(
+    path,
+    proc: Preprocessor,
+    chunksize: int = 100_000,
+    **read_csv_kwargs,
+    ) -> Iterator[tuple[pd.DataFrame, np.ndarray | None]]:
+    """
+    Yield the (X, y) numeric batches of a csv file preprocessed by a fitted
+    Preprocessor, one chunk at a time so that memory does not grow with the
+    size of the file.
+    """
+    for chunk in read_csv_chunks(path, chunksize = chunksize, **read_csv_kwargs):
+        yield proc.transform(chunk)
+
+
+def process_csv(
+    path,
+    y_field: str | None = None,
+    chunksize: int = 100_000,
+    read_csv_kwargs: dict | None = None,
+    **fit_kwargs,
+    ) -> Iterator[tuple[pd.DataFrame, np.ndarray | None]]:
+    """
+    Out-of-core counterpart of process_df: one pass over path to fit the
+    preprocessing statistics, then a second one yielding processed batches.
+    """
+    read_csv_kwargs = read_csv_kwargs or {}
+    proc = fit_stream(path, y_field = y_field, chunksize = chunksize, **fit_kwargs, **read_csv_kwargs)
+    yield from iter_batches(path, proc, chunksize = chunksize, **read_csv_kwargs)
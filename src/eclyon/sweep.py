@@ -0,0 +1,156 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, Mapping, Sequence
+import heapq
+import numpy as np
+import pandas as pd
+
+from eclyon.categories import CategoryEncoder
+from eclyon.predict import Predictor, load_predictor
+from eclyon.presets import BASE_SETUP, CAR_PRESETS, TRACK_PRESETS
+
+
+def base_setup(
+    car: str | None = None,
+    track: str | None = None,
+    encoder: CategoryEncoder | None = None,
+    **overrides,
+    ) -> dict:
+    """
+    Input row of the demo app for a car and a track preset. Categorical
+    columns hold level names unless encoder (the CategoryEncoder saved with
+    the model) is given, which sweep and coordinate_descent need.
+    """
+    setup = dict(BASE_SETUP)
+    setup.update(CAR_PRESETS.get(car, {}))
+    setup.update(TRACK_PRESETS.get(track, {}))
+    setup.update(overrides)
+    return setup if encoder is None else encoder.encode_row(setup)
+
+
+class Grid:
+    """
+    Cartesian grid over a few columns, enumerated lazily: candidate i is
+    decoded from its flat index, so blocks of candidates can be built
+    anywhere (e.g. in a worker process) without materializing the grid.
+    """
+
+    def __init__(self, axes: Mapping[str, Sequence[float]]):
+        self.columns = list(axes)
+        self.values = [np.asarray(v, dtype = np.float64) for v in axes.values()]
+        self.shape = tuple(len(v) for v in self.values)
+        self.size = int(np.prod(self.shape))
+
+    @classmethod
+    def from_ranges(cls, ranges: Mapping[str, tuple[float, float, int]]) -> 'Grid':
+        """
+        Build a grid from (low, high, number of values) ranges.
+        """
+        return cls({n: np.linspace(lo, hi, num) for n, (lo, hi, num) in ranges.items()})
+
+    def decode(self, flat: np.ndarray) -> np.ndarray:
+        """
+        Values of the candidates of the given flat indices, as a (n, n_axes) array.
+        """
+        idx = np.unravel_index(flat, self.shape)
+        return np.column_stack([v[i] for v, i in zip(self.values, idx)])
+
+    def block(self, start: int, stop: int) -> np.ndarray:
+        return self.decode(np.arange(start, min(stop, self.size)))
+
+    def blocks(self, block_size: int) -> Iterator[tuple[int, int]]:
+        for start in range(0, self.size, block_size):
+            yield start, min(start + block_size, self.size)
+
+
+def _expand(predictor: Predictor, base: Mapping, columns: list[str], values: np.ndarray) -> np.ndarray:
+    """
+    Repeat the base row once per candidate and write the candidate values in.
+    """
+    X = np.repeat(predictor.as_array(base), len(values), axis = 0)
+    X[:, [predictor.feature_names.index(n) for n in columns]] = values
+    return X
+
+
+def _score_block(model_path, base: Mapping, grid: Grid, start: int, stop: int, k: int):
+    """
+    Score one block of the grid and return its k fastest candidates.
+    """
+    predictor = load_predictor(model_path)
+    y = predictor.predict(_expand(predictor, base, grid.columns, grid.block(start, stop)))
+    best = np.argpartition(y, k)[:k] if len(y) > k else np.arange(len(y))
+    return y[best], best + start
+
+
+def sweep(
+    model_path,
+    base: Mapping,
+    grid: Grid,
+    k: int = 10,
+    block_size: int = 65_536,
+    n_jobs: int | None = None,
+    ) -> pd.DataFrame:
+    """
+    Exhaustively score every candidate of the grid around the base setup and
+    return the k fastest predicted laps. Blocks are scored in a process pool
+    (n_jobs = 1 scores them in process) and only a bounded heap of the best
+    candidates is kept.
+    """
+    heap = []
+
+    def push(times, flat):
+        for t, i in zip(times, flat):
+            if len(heap) < k:
+                heapq.heappush(heap, (-t, i))
+            elif -heap[0][0] > t:
+                heapq.heapreplace(heap, (-t, i))
+
+    if n_jobs == 1:
+        for start, stop in grid.blocks(block_size):
+            push(*_score_block(model_path, base, grid, start, stop, k))
+    else:
+        with ProcessPoolExecutor(n_jobs) as pool:
+            futures = [
+                pool.submit(_score_block, model_path, base, grid, start, stop, k)
+                for start, stop in grid.blocks(block_size)
+            ]
+            for f in futures:
+                push(*f.result())
+
+    best = sorted((-t, i) for t, i in heap)
+    flat = np.array([i for _, i in best], dtype = np.int64)
+    res = pd.DataFrame(grid.decode(flat), columns = grid.columns)
+    res['Lap_Time_s'] = [t for t, _ in best]
+    return res
+
+
+def coordinate_descent(
+    predictor: Predictor,
+    base: Mapping,
+    grid: Grid,
+    max_rounds: int = 20,
+    ) -> tuple[dict, float, int]:
+    """
+    Search the grid one axis at a time: each step scores every value of one
+    axis with the others held fixed and keeps the best, until a full round
+    brings no improvement. Costs sum(grid.shape) predictions per round
+    instead of prod(grid.shape).
+    Return the best setup found, its predicted lap time and the number of
+    candidates scored.
+    """
+    current = np.array([len(v) // 2 for v in grid.values])
+    best_time, n_scored = np.inf, 0
+    for _ in range(max_rounds):
+        improved = False
+        for a, values in enumerate(grid.values):
+            candidates = np.tile([v[i] for v, i in zip(grid.values, current)], (len(values), 1))
+            candidates[:, a] = values
+            y = predictor.predict(_expand(predictor, base, grid.columns, candidates))
+            n_scored += len(y)
+            i = int(np.argmin(y))
+            if y[i] < best_time:
+                improved = improved or i != current[a]
+                best_time, current[a] = float(y[i]), i
+        if not improved:
+            break
+    setup = {n: float(v[i]) for n, v, i in zip(grid.columns, grid.values, current)}
+    return setup, best_time, n_scored
@@ -1,52 +1,105 @@
+from datetime import datetime
 from typing import Callable
 import copy
 import re
 import numpy as np
 import pandas as pd
-from pandas.api.types import is_string_dtype, is_numeric_dtype
+from pandas.api.types import is_string_dtype, is_numeric_dtype, is_datetime64_any_dtype
+from pandas.tseries.api import guess_datetime_format
 
+from eclyon.categories import CategoryEncoder
+from eclyon.instrument import instrumented, stage
 
-def add_date_columns(df: pd.DataFrame, fields: list[str], drop: bool = True) -> pd.DataFrame:
+
+DATE_ATTRIBUTES = {
+    'Year': np.int16, 'Month': np.int8, 'Day': np.int8,
+    'Dayofweek': np.int8, 'Dayofyear': np.int16,
+    'Is_month_start': bool, 'Is_month_end': bool,
+    'Is_quarter_start': bool, 'Is_quarter_end': bool,
+    'Is_year_start': bool, 'Is_year_end': bool,
+}
+
+# Format detected for each date field, reused by the later batches it still parses
+_date_formats: dict[str, str | None] = {}
+
+
+def _parses(value: str, date_format: str) -> bool:
+    try:
+        datetime.strptime(value, date_format)
+    except ValueError:
+        return False
+    return True
+
+
+def detect_date_format(fld: pd.Series) -> str | None:
+    """
+    Guess the strftime format of a column of date strings from its first
+    non-null value, and cache it under the column name. The cached format
+    is only reused if it parses that value, so a later frame with a column
+    of the same name in another format gets its own.
+    """
+    sample = fld.dropna()
+    if not len(sample):
+        return None
+    value = str(sample.iloc[0])
+    date_format = _date_formats.get(fld.name)
+    if date_format is None or not _parses(value, date_format):
+        date_format = _date_formats[fld.name] = guess_datetime_format(value)
+    return date_format
+
+
+@instrumented
+def add_date_columns(
+    df: pd.DataFrame, 
+    fields: list[str], 
+    drop: bool = True, 
+    date_format: str | None = None,
+    compact: bool = False,
+    ) -> pd.DataFrame:
     """
     Convert a column of df from a datetime64 to many columns containing
-    the information from the date.
+    the information from the date. Each distinct value is parsed and
+    decomposed once, and all the new columns are added in a single concat.
+    With compact = True, they get int8/int16/bool dtypes instead of the
+    default pandas ones (unless the column has missing dates).
     """
-    df = copy.deepcopy(df)
+    df = df.copy(deep = False)
+    new = {}
         
     for field in fields:
         fld = df[field]
-        fld_dtype = fld.dtype
-        
-        if isinstance(fld_dtype, pd.core.dtypes.dtypes.DatetimeTZDtype):
-            fld_dtype = np.datetime64
-
-        if not np.issubdtype(fld_dtype, np.datetime64):
-            df[field] = fld = pd.to_datetime(fld, infer_datetime_format = True)
+        codes, uniques = pd.factorize(fld, use_na_sentinel = False)
+        if not is_date(fld):
+            uniques = pd.to_datetime(uniques, format = date_format or detect_date_format(fld))
+            df[field] = uniques[codes]
+        uniques = pd.DatetimeIndex(uniques)
+        missing = uniques.isna()
         targ_pre = re.sub('[Dd]ate$', '', field)
-        attr = [
-            'Year', 'Month', 'Day', 
-            'Dayofweek', 'Dayofyear',
-            'Is_month_start', 'Is_month_end',
-            'Is_quarter_start', 'Is_quarter_end',
-            'Is_year_start', 'Is_year_end',
-        ]
-        for n in attr: 
-            df[targ_pre + n] = getattr(fld.dt, n.lower())
+        for n, dtype in DATE_ATTRIBUTES.items(): 
+            values = np.asarray(getattr(uniques, n.lower()))
+            if compact and not missing.any():
+                values = values.astype(dtype)
+            new[targ_pre + n] = values[codes]
             
-        df[targ_pre + 'Elapsed'] = fld.astype(np.int64) // 10 ** 9
+        elapsed = uniques.as_unit('ns').asi8 // 10 ** 9
+        if missing.any():
+            elapsed = np.where(missing, np.nan, elapsed)
+        new[targ_pre + 'Elapsed'] = elapsed[codes]
         
     if drop: 
-        df.drop(columns = fields, axis = 1, inplace = True)
-    return df
+        df = df.drop(columns = fields)
+    return pd.concat([df, pd.DataFrame(new, index = df.index)], axis = 1)
 
     
 def is_date(x: pd.Series) -> bool: 
     """
-    Assert whether a pandas Series is of dtype np.datetime64.
+    Assert whether a pandas Series is of dtype np.datetime64, timezone aware
+    or not.
     """
-    return np.issubdtype(x.dtype, np.datetime64)
+    return is_datetime64_any_dtype(x)
 
 
+@instrumented
 def change_columns_from_str_to_categorical(df: pd.DataFrame) -> pd.DataFrame:
     """
     Change any columns of strings in a panda's dataframe to a column of
@@ -60,16 +113,18 @@ def change_columns_from_str_to_categorical(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
     
+@instrumented
 def apply_cats(df, trn):
     """
     Changes any columns of strings in df into categorical variables using trn as
-    a template for the category codes.
+    a template for the category codes. trn is either the training frame or the
+    CategoryEncoder returned by a previous call, so that the mapping table is
+    only built once when scoring a stream of batches. Levels that are not in
+    trn become NaN and are counted in encoder.unseen (see unseen_report).
     """
-    for n, c in df.items():
-        if (n in trn.columns) and (trn[n].dtype.name == 'category'):
-            df[n] = c.astype('category').cat.as_ordered()
-            df[n].cat.set_categories(trn[n].cat.categories, ordered = True, inplace = True)
-    return
+    encoder = trn if isinstance(trn, CategoryEncoder) else CategoryEncoder.from_template(trn)
+    encoder.categorize(df, inplace = True)
+    return encoder
 
 
 def fix_missing(df, col, name, na_dict):
@@ -97,6 +152,173 @@ def numericalize(df: pd.DataFrame, col: str, name: str, max_n_cat: int | None) -
     return df
 
 
+class Preprocessor:
+    """
+    Fitted counterpart of process_df. fit learns the fill values (na_dict), the
+    category templates and the dummy layout once, transform then applies them
+    to any frame in a single pass, without deep copies and optionally in place.
+    """
+
+    def __init__(
+        self,
+        y_field: str | None = None,
+        skip_flds: list | None = None,
+        ignore_flds: list | None = None,
+        na_dict: dict | None = None,
+        max_n_cat: int | None = None,
+        ):
+        self.y_field = y_field
+        self.skip_flds = list(skip_flds or [])
+        self.ignore_flds = list(ignore_flds or [])
+        self.na_dict = dict(na_dict or {})
+        self.max_n_cat = max_n_cat
+
+    def _fit_columns(self, columns) -> list[str]:
+        dropped = set(self.skip_flds) | set(self.ignore_flds) | {self.y_field}
+        return [n for n in columns if n not in dropped]
+
+    def _flags_missing(self, name: str, has_na: bool) -> bool:
+        """
+        Whether a {name}_na column is emitted: for the columns of a given
+        na_dict if there is one, else for the columns with missing values.
+        """
+        return name in self.na_dict if self.na_dict else has_na
+
+    @instrumented
+    def fit(self, df: pd.DataFrame) -> 'Preprocessor':
+        """
+        Learn the medians, category templates and output layout from df.
+        """
+        na_dict, na_flags, categories = dict(self.na_dict), [], {}
+        for n in self._fit_columns(df.columns):
+            c = df[n]
+            if is_numeric_dtype(c):
+                has_na = c.hasnans
+                if has_na or (n in na_dict):
+                    na_dict.setdefault(n, c.median())
+                    if self._flags_missing(n, has_na):
+                        na_flags.append(n)
+            elif isinstance(c.dtype, pd.CategoricalDtype):
+                categories[n] = c.cat.categories
+            else:
+                categories[n] = pd.Categorical(c).categories
+        y_categories = None
+        if self.y_field is not None and not is_numeric_dtype(df[self.y_field]):
+            y_categories = pd.Categorical(df[self.y_field]).categories
+        return self._set_state(list(df.columns), na_dict, na_flags, categories, y_categories)
+
+    def _set_state(
+        self,
+        columns: list[str],
+        na_dict: dict,
+        na_flags: list[str],
+        categories: dict,
+        y_categories: pd.Index | None = None,
+        ) -> 'Preprocessor':
+        """
+        Freeze the fitted state and derive the output column layout from it.
+        """
+        self.na_dict_ = na_dict
+        self.na_flags_ = na_flags
+        self.categories_ = categories
+        self.y_categories_ = y_categories
+        self.dummies_ = {
+            n: cats for n, cats in categories.items()
+            if self.max_n_cat is not None and len(cats) <= self.max_n_cat
+        }
+        kept = [n for n in self._fit_columns(columns) if n not in self.dummies_]
+        self.columns_ = (
+            [n for n in self.ignore_flds if n in columns] + kept
+            + [n + '_na' for n in na_flags]
+            + [f'{n}_{v}' for n, cats in self.dummies_.items() for v in list(cats) + ['nan']]
+        )
+        return self
+
+    @instrumented
+    def _numericalize(self, df: pd.DataFrame, columns: list[str], replaced: dict, added: dict) -> None:
+        """
+        Category codes (plus one) or dummies of the categorical columns.
+        """
+        for n in columns:
+            codes = pd.Categorical(df[n], categories = self.categories_[n]).codes
+            if n in self.dummies_:
+                levels = list(self.dummies_[n])
+                for i, v in enumerate(levels):
+                    added[f'{n}_{v}'] = codes == i
+                added[f'{n}_nan'] = codes == -1
+            else:
+                replaced[n] = codes + 1
+
+    @instrumented
+    def _fix_missing(self, df: pd.DataFrame, columns: list[str], replaced: dict, added: dict) -> None:
+        """
+        Missing values of the numeric columns filled with the fitted medians,
+        and their _na flags.
+        """
+        for n in columns:
+            c = df[n]
+            if n in self.na_dict_ or c.hasnans:
+                if n in self.na_flags_:
+                    added[n + '_na'] = c.isna().to_numpy()
+                replaced[n] = c.fillna(self.na_dict_.get(n, c.median()))
+
+    def _encode(self, df: pd.DataFrame) -> tuple[dict, dict]:
+        """
+        Compute the replaced and the new columns of df, without touching df.
+        """
+        columns = self._fit_columns(df.columns)
+        replaced, added = {}, {}
+        self._numericalize(df, [n for n in columns if n in self.categories_], replaced, added)
+        self._fix_missing(df, [n for n in columns if n not in self.categories_], replaced, added)
+        # Keep the _na flags ahead of the dummies, as process_df does
+        added = {k: added[k] for k in self.columns_ if k in added}
+        return replaced, added
+
+    def _target(self, df: pd.DataFrame):
+        if self.y_field is None or self.y_field not in df.columns:
+            return None
+        if self.y_categories_ is None:
+            return df[self.y_field].values
+        return pd.Categorical(df[self.y_field], categories = self.y_categories_).codes
+
+    @instrumented
+    def transform(self, df: pd.DataFrame, inplace: bool = False) -> tuple[pd.DataFrame, np.ndarray | None]:
+        """
+        Apply the fitted state to df and return the numeric frame and the target.
+        With inplace = True, df itself is modified and returned; its original
+        column order is kept and the new columns are appended at the end.
+        """
+        y = self._target(df)
+        with stage('Preprocessor.encode', df):
+            replaced, added = self._encode(df)
+        if inplace:
+            df.drop(
+                columns = [n for n in self.skip_flds + [self.y_field] + list(self.dummies_) if n in df.columns],
+                inplace = True,
+            )
+            for n, v in replaced.items():
+                df[n] = v
+            for n, v in added.items():
+                df[n] = v
+            return df, y
+        # The untouched columns are copied in one take, so that the output
+        # never shares memory with df (which is left unchanged, as with process_df)
+        kept = df[[n for n in self.columns_ if n not in replaced and n not in added and n in df.columns]].copy()
+        data = {}
+        for n in self.columns_:
+            if n in replaced:
+                data[n] = replaced[n]
+            elif n in added:
+                data[n] = added[n]
+            elif n in kept.columns:
+                data[n] = kept[n]
+        return pd.DataFrame(data, index = df.index, copy = False), y
+
+    def fit_transform(self, df: pd.DataFrame, inplace: bool = False) -> tuple[pd.DataFrame, np.ndarray | None]:
+        return self.fit(df).transform(df, inplace = inplace)
+
+
+@instrumented
 def process_df(
     df: pd.DataFrame, 
     y_field: str | None = None, 
@@ -112,39 +334,22 @@ def process_df(
     which is not in skip_flds nor in ignore_flds, na values are replaced by the
     median value of the column.
     """
-    df = copy.deepcopy(df)
-    
-    df_ignored = df.loc[:, ignore_flds]
-    df = df.drop(columns = ignore_flds)
-    
     if preproc_fn: 
-        preproc_fn(df)
-        
-    if y_field is None: 
-        y = None
-    else:
-        if not is_numeric_dtype(df[y_field]): 
-            df[y_field] = pd.Categorical(df[y_field]).codes
-        y = df[y_field].values
-        skip_flds += [y_field]
-    
-    df = df.drop(columns = skip_flds)
+        with stage('process_df.preproc_fn', df):
+            df_ignored = df.loc[:, ignore_flds]
+            df = df.drop(columns = ignore_flds)
+            preproc_fn(df)
+            df = pd.concat([df_ignored, df], axis = 1)
 
-    na_dict_initial = na_dict.copy()
-    for n, c in df.items(): 
-        na_dict = fix_missing(df, c, n, na_dict)
-    
-    if len(na_dict_initial) > 0:
-        df = df.drop(
-            [a + '_na' for a in list(set(na_dict.keys()) - set(na_dict_initial.keys()))], 
-            axis = 1,
-        )
-    for n,c in df.items(): 
-        df = numericalize(df, c, n, max_n_cat)
-        
-    df = pd.get_dummies(df, dummy_na = True)
-    df = pd.concat([df_ignored, df], axis = 1)
-    return (df, y, na_dict)
+    proc = Preprocessor(
+        y_field = y_field,
+        skip_flds = skip_flds,
+        ignore_flds = ignore_flds,
+        na_dict = na_dict,
+        max_n_cat = max_n_cat,
+    )
+    df, y = proc.fit_transform(df)
+    return (df, y, proc.na_dict_)
 
 
 def split_vals(df: pd.DataFrame, n: int) -> pd.DataFrame: 
@@ -0,0 +1,261 @@
+"""
+Hyperparameter search with successive halving / Hyperband.
+
+    board = hyperband(X, y, cache_dir = 'tuning', out_path = 'leaderboard.csv')
+
+Configurations are sampled from a search space of model families and
+hyperparameter values, and cross-validated on a growing fraction of the
+training rows of every fold; only the best 1 / eta of each rung is promoted
+to the next, eta times larger, fraction. Hyperband runs several such brackets
+trading the number of configurations for their starting fraction.
+
+Everything is cached under cache_dir: the folds (model_zoo.share_folds) by
+data fingerprint, every fitted model and every score by (family, params,
+fraction, seed, data). An interrupted search started again with the same
+arguments replays the finished evaluations from the cache and resumes where
+it stopped. The leaderboard is rewritten after every rung.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from math import ceil, floor, log
+from pathlib import Path
+import json
+import os
+import time
+import uuid
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor, ExtraTreesRegressor
+from sklearn.linear_model import Ridge, Lasso
+from sklearn.tree import DecisionTreeRegressor
+
+from eclyon.cache import fingerprint
+from eclyon.model_zoo import load_folds, share_folds
+
+
+FAMILIES = {
+    'Lasso': Lasso,
+    'Ridge': Ridge,
+    'DecisionTree': DecisionTreeRegressor,
+    'RandomForest': RandomForestRegressor,
+    'ExtraTrees': ExtraTreesRegressor,
+}
+
+
+def default_search_space() -> dict:
+    """
+    Hyperparameter values tried for every model family, around the ones
+    picked by hand in the notebook.
+    """
+    forest = {
+        'n_estimators': [100, 200, 400],
+        'max_depth': [None, 10, 15, 20],
+        'min_samples_leaf': [1, 5, 15],
+        'max_features': [1.0, 0.5, 'sqrt'],
+    }
+    return {
+        'Lasso': {'alpha': [0.001, 0.01, 0.03, 0.1, 0.3, 0.5, 1.0], 'max_iter': [10000]},
+        'Ridge': {'alpha': [0.01, 0.1, 0.5, 1.0, 3.0, 10.0, 30.0]},
+        'DecisionTree': {'max_depth': [5, 10, 15, None], 'min_samples_leaf': [1, 5, 15, 30]},
+        'RandomForest': forest,
+        'ExtraTrees': forest,
+    }
+
+
+def sample_configs(space: dict, n: int, rng: np.random.Generator) -> list[tuple[str, dict]]:
+    """
+    n (family, params) pairs, the family and every value drawn uniformly.
+    """
+    families = list(space)
+    configs = []
+    for _ in range(n):
+        family = families[rng.integers(len(families))]
+        configs.append((family, {p: values[rng.integers(len(values))] for p, values in space[family].items()}))
+    return configs
+
+
+def unique_configs(configs: list[tuple[str, dict]]) -> list[tuple[str, dict]]:
+    """
+    configs without repeats, in order of first appearance: two copies of a
+    configuration would be evaluated concurrently under the same cache key.
+    """
+    unique = {}
+    for family, params in configs:
+        unique.setdefault((family, json.dumps(params, sort_keys = True)), (family, params))
+    return list(unique.values())
+
+
+def make_estimator(family: str, params: dict, seed: int):
+    estimator = FAMILIES[family](**params)
+    extra = {'random_state': seed, 'n_jobs': 1}
+    return estimator.set_params(**{p: v for p, v in extra.items() if p in estimator.get_params()})
+
+
+def _dump(obj, path: Path) -> None:
+    # One tmp file per writer, so that concurrent writers of the same path never share it
+    tmp = path.with_name(f'{path.name}.{os.getpid()}.{uuid.uuid4().hex}.tmp')
+    if path.suffix == '.json':
+        tmp.write_text(json.dumps(obj))
+    else:
+        joblib.dump(obj, tmp)
+    os.replace(tmp, path)
+
+
+def evaluate(family: str, params: dict, fraction: float, folder, cache_dir, key: str, seed: int) -> dict:
+    """
+    Cross-validated RMSE of a configuration fitted on fraction of the
+    training rows of every fold. Training subsets are nested: the rows are
+    shuffled once with seed, so a larger fraction extends a smaller one.
+    Fitted models are cached per fold, the result once all folds are done.
+    """
+    cache_dir = Path(cache_dir)
+    X, y, fold = load_folds(folder)
+    order = np.random.default_rng(seed).permutation(len(X))
+    rmse, fit_time = [], 0.0
+    for k in np.unique(fold):
+        train = order[fold[order] != k]
+        train = np.sort(train[:max(1, round(fraction * len(train)))])
+        test = np.flatnonzero(fold == k)
+        model_path = cache_dir / 'models' / f'{key}_{k}.pkl'
+        if model_path.exists():
+            estimator = joblib.load(model_path)
+        else:
+            estimator = make_estimator(family, params, seed)
+            start = time.perf_counter()
+            estimator.fit(X[train], y[train])
+            fit_time += time.perf_counter() - start
+            _dump(estimator, model_path)
+        rmse.append(float(np.sqrt(np.mean((y[test] - estimator.predict(X[test])) ** 2))))
+    res = {
+        'key': key,
+        'family': family,
+        'params': json.dumps(params, sort_keys = True),
+        'fraction': fraction,
+        'rmse': float(np.mean(rmse)),
+        'rmse_std': float(np.std(rmse)),
+        'fit_time_s': fit_time,
+    }
+    _dump(res, cache_dir / 'results' / f'{key}.json')
+    return res
+
+
+class Tuner:
+    """
+    Runs the evaluations of a search on a process pool, skipping those
+    already in the cache.
+    """
+
+    def __init__(self, X, y, cache_dir, n_splits: int = 5, n_jobs: int | None = None, seed: int = 42, out_path = None):
+        self.cache_dir = Path(cache_dir)
+        for sub in ('folds', 'models', 'results'):
+            (self.cache_dir / sub).mkdir(parents = True, exist_ok = True)
+        X = np.asarray(X, dtype = np.float64)
+        y = np.asarray(y, dtype = np.float64)
+        self.data = fingerprint(X, y, n_splits)
+        self.folder = self.cache_dir / 'folds' / self.data
+        if not (self.folder / 'fold.npy').exists():
+            share_folds(X, y, self.folder, n_splits = n_splits)
+        self.n_jobs = n_jobs
+        self.seed = seed
+        self.out_path = out_path
+        self.results = []
+
+    def key(self, family: str, params: dict, fraction: float) -> str:
+        return fingerprint(family, params, round(fraction, 6), self.seed, self.data)
+
+    def run(self, pool: ProcessPoolExecutor, configs: list[tuple[str, dict]], fraction: float, **info) -> list[dict]:
+        """
+        Evaluate configs on fraction of the training rows, in order.
+        """
+        pending = []
+        for family, params in configs:
+            key = self.key(family, params, fraction)
+            cached = self.cache_dir / 'results' / f'{key}.json'
+            if cached.exists():
+                pending.append(json.loads(cached.read_text()))
+            else:
+                pending.append(pool.submit(
+                    evaluate, family, params, fraction, self.folder, self.cache_dir, key, self.seed,
+                ))
+        res = [{**(p if isinstance(p, dict) else p.result()), **info} for p in pending]
+        self.results += res
+        if self.out_path is not None:
+            self.leaderboard().to_csv(self.out_path, index = False)
+        return res
+
+    def successive_halving(
+        self,
+        pool: ProcessPoolExecutor,
+        configs: list[tuple[str, dict]],
+        min_fraction: float,
+        eta: int = 3,
+        bracket: int = 0,
+        ) -> list[dict]:
+        """
+        Evaluate configs on min_fraction of the rows, keep the best 1 / eta
+        and multiply the fraction by eta, until the full training set.
+        Configurations sampled several times are evaluated once.
+        """
+        configs = unique_configs(configs)
+        fraction, rung = min_fraction, 0
+        while True:
+            res = self.run(pool, configs, fraction, bracket = bracket, rung = rung)
+            if fraction >= 1:
+                return res
+            keep = np.argsort([r['rmse'] for r in res], kind = 'stable')[:max(1, len(configs) // eta)]
+            configs = [configs[i] for i in keep]
+            fraction, rung = min(1.0, fraction * eta), rung + 1
+
+    def hyperband(self, space: dict | None = None, min_fraction: float = 1 / 9, eta: int = 3) -> pd.DataFrame:
+        """
+        Run every Hyperband bracket, from many configurations on min_fraction
+        of the rows to a few on all of them.
+        """
+        space = default_search_space() if space is None else space
+        rng = np.random.default_rng(self.seed)
+        s_max = floor(log(1 / min_fraction, eta) + 1e-9)
+        with ProcessPoolExecutor(self.n_jobs) as pool:
+            for s in range(s_max, -1, -1):
+                n = ceil((s_max + 1) / (s + 1) * eta ** s)
+                self.successive_halving(pool, sample_configs(space, n, rng), eta ** -s, eta, bracket = s)
+        return self.leaderboard()
+
+    def leaderboard(self) -> pd.DataFrame:
+        """
+        One row per configuration with its score at the largest fraction it
+        reached, best first.
+        """
+        results = pd.DataFrame(self.results)
+        if results.empty:
+            return results
+        results = results.sort_values(['fraction', 'rmse'], ascending = [False, True])
+        board = results.drop_duplicates(['family', 'params'])
+        return board.sort_values(['fraction', 'rmse'], ascending = [False, True], ignore_index = True)
+
+
+def hyperband(
+    X,
+    y,
+    space: dict | None = None,
+    cache_dir = 'tuning',
+    out_path = None,
+    min_fraction: float = 1 / 9,
+    eta: int = 3,
+    n_splits: int = 5,
+    n_jobs: int | None = None,
+    seed: int = 42,
+    ) -> pd.DataFrame:
+    """
+    Hyperband search over space on (X, y), returning the leaderboard, also
+    written to out_path as csv when given.
+    """
+    tuner = Tuner(X, y, cache_dir, n_splits = n_splits, n_jobs = n_jobs, seed = seed, out_path = out_path)
+    return tuner.hyperband(space, min_fraction, eta)
+
+
+def best_estimator(board: pd.DataFrame, seed: int = 42):
+    """
+    Unfitted estimator of the best configuration of a leaderboard.
+    """
+    best = board.iloc[0]
+    return make_estimator(best['family'], json.loads(best['params']), seed)
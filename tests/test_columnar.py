@@ -0,0 +1,19 @@
+import numpy as np
+import pandas as pd
+
+from eclyon.columnar import ColumnarDataset, convert_csv
+
+
+def test_round_trip_with_missing_values(tmp_path):
+    df = pd.DataFrame({
+        'Track_Condition': ['dry', None, 'wet', 'dry', None],
+        'Track_Length_km': [5.8, 13.6, np.nan, 7.0, 20.8],
+        'Lap_Time_s': [90.0, 95.0, 92.0, 91.0, 99.0],
+    })
+    df.to_csv(tmp_path / 'ds.csv', index = False)
+    ds = ColumnarDataset(convert_csv(tmp_path / 'ds.csv', tmp_path / 'ds', chunksize = 2))
+
+    decoded = ds.decode('Track_Condition', ds.column('Track_Condition'))
+    pd.testing.assert_series_equal(pd.Series(decoded, dtype = object), df['Track_Condition'].astype(object), check_names = False)
+    np.testing.assert_array_equal(ds.column('Track_Length_km'), df['Track_Length_km'])
+    np.testing.assert_array_equal(ds.y, df['Lap_Time_s'])
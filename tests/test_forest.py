@@ -0,0 +1,42 @@
+import tracemalloc
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+from eclyon.forest import FlatForest
+
+
+@pytest.fixture(scope = 'module')
+def forest_and_rows():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size = (2000, 6))
+    y = X[:, 0] * 3 + np.sin(X[:, 1]) + rng.normal(size = 2000)
+    model = RandomForestRegressor(n_estimators = 100, max_depth = 8, random_state = 0).fit(X, y)
+    return FlatForest.from_sklearn(model), rng.normal(size = (20_000, 6))
+
+
+def _peak(fn) -> int:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_predict_dist_matches_tree_predictions(forest_and_rows):
+    forest, X = forest_and_rows
+    X = X[:500]
+    dist = forest.predict_dist(X)
+    values = forest.predict_trees(X)
+    np.testing.assert_allclose(dist['mean'], values.mean(axis = 0), atol = 1e-10)
+    np.testing.assert_allclose(dist['var'], values.var(axis = 0), atol = 1e-10)
+    resolution = np.ptp(forest.value) / 32 ** 3
+    for q in (0.05, 0.5, 0.95):
+        np.testing.assert_allclose(dist[f'q{round(q * 100):g}'], np.quantile(values, q, axis = 0), atol = resolution)
+
+
+def test_predict_dist_memory_below_tree_predictions(forest_and_rows):
+    forest, X = forest_and_rows
+    X = X.astype(np.float32)
+    assert _peak(lambda: forest.predict_dist(X)) < _peak(lambda: forest.predict_trees(X)) / 2
@@ -0,0 +1,17 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from eclyon.incremental import IncrementalForest
+
+
+def test_add_trees_rejects_misaligned_columns(tmp_path):
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size = (200, 3)), columns = ['a', 'b', 'c'])
+    forest = IncrementalForest(tmp_path / 'forest.pkl', {'max_depth': 3}, n_jobs = 1)
+    forest.grow_to(X, X['a'], 5)
+    with pytest.raises(ValueError):
+        forest.add_trees(X[['b', 'a', 'c']], X['a'], 5)
+    with pytest.raises(ValueError):
+        forest.add_trees(X[['a', 'b']].to_numpy(), X['a'], 5)
+    assert forest.n_estimators == 5
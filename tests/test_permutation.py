@@ -0,0 +1,24 @@
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+
+from eclyon.permutation import permutation_importance
+
+
+def test_early_stop_saves_repeats():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size = (2000, 6)), columns = list('abcdef'))
+    y = X @ np.array([8.0, 4.0, 2.0, 1.0, 0.0, 0.0]) + rng.normal(0, 0.1, len(X))
+    model = LinearRegression().fit(X, y)
+
+    full = permutation_importance(model, X, y, n_repeats = 20, n_jobs = 1)
+    early = permutation_importance(model, X, y, n_repeats = 20, n_jobs = 1, early_stop = True)
+    assert (full['n_repeats'] == 20).all()
+    assert list(early['cols'][:4]) == ['a', 'b', 'c', 'd']
+    # The used features are told apart early, only the two tied unused ones run on
+    assert (early['n_repeats'][:4] < 20).all()
+    assert early['n_repeats'].sum() < full['n_repeats'].sum() / 2
+
+    # With a cutoff, the unused features stop once they are clear of it
+    top = permutation_importance(model, X, y, n_repeats = 20, n_jobs = 1, early_stop = True, top_k = 2)
+    assert (top['n_repeats'] < 20).all()
@@ -0,0 +1,30 @@
+import asyncio
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+
+from eclyon.predict import Predictor
+from eclyon.server import Metrics, MicroBatcher
+
+
+def test_batcher_survives_cancelled_and_failed_requests():
+    X = pd.DataFrame(np.eye(3), columns = ['a', 'b', 'c'])
+    predictor = Predictor(LinearRegression().fit(X, [1.0, 2.0, 3.0]))
+
+    async def scenario():
+        batcher = MicroBatcher(predictor, Metrics(), max_delay = 0.05)
+        runner = asyncio.create_task(batcher.run())
+        cancelled = asyncio.create_task(batcher.submit(np.eye(3)[:1]))
+        kept = asyncio.create_task(batcher.submit(np.eye(3)[1:]))
+        await asyncio.sleep(0.01)
+        cancelled.cancel()
+        assert np.allclose(await kept, [2.0, 3.0])
+        # Rows of the wrong width make the whole batch fail
+        with pytest.raises(ValueError):
+            await asyncio.gather(batcher.submit(np.ones((1, 3))), batcher.submit(np.ones((1, 2))))
+        assert np.allclose(await batcher.submit(np.eye(3)[:1]), [1.0])
+        assert not runner.done()
+        runner.cancel()
+
+    asyncio.run(asyncio.wait_for(scenario(), 5))
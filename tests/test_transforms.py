@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+
+from eclyon.transforms import process_df
+
+
+def _frame() -> pd.DataFrame:
+    return pd.DataFrame({
+        'Car_Weight_kg': [1200.0, 1300.0, 1250.0],
+        'Engine_Power_hp': [500, 600, 550],
+        'Fuel_Consumption_L_100km': [10.0, np.nan, 12.0],
+        'Track_Condition': ['dry', 'wet', 'dry'],
+        'Lap_Time_s': [90.0, 95.0, 92.0],
+    })
+
+
+def test_process_df_output_does_not_alias_input():
+    ds = _frame()
+    before = ds.copy()
+    out, y, na = process_df(ds, 'Lap_Time_s')
+    out.loc[0, 'Car_Weight_kg'] = -1
+    values = out['Engine_Power_hp'].values
+    # Read-only under Copy-on-Write, writable (and then checked) without it
+    if values.flags.writeable:
+        values[1] = -2
+    out.loc[2, 'Fuel_Consumption_L_100km'] = -3
+    pd.testing.assert_frame_equal(ds, before)